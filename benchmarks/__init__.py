@@ -0,0 +1,8 @@
+"""
+Benchmarks
+
+Stand-alone performance measurements for the service. They are not part of
+the test suite. Run them as modules from the project root, for example:
+
+    python -m benchmarks.list_serialization
+"""
@@ -0,0 +1,158 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Gunicorn Worker Benchmark
+
+Starts gunicorn with gunicorn.conf.py once for every worker class and
+measures the throughput and latency of concurrent keep-alive clients that
+read single Products and pages of Products.
+
+Usage:
+    DATABASE_URI=sqlite:////tmp/bench.db python -m benchmarks.gunicorn_workers
+    python -m benchmarks.gunicorn_workers --clients 64 --seconds 20 --modes gthread
+
+WARNING: the benchmark deletes every Product in the configured database.
+"""
+import argparse
+import http.client
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from service import create_app
+from service.models import db, init_db, Product
+from tests.factories import ProductFactory
+
+
+def seed(count: int) -> list:
+    """Replaces the Products in the database with count fake ones"""
+    db.session.query(Product).delete()
+    db.session.commit()
+    products = Product.create_batch(ProductFactory.build_batch(count))
+    return [product.id for product in products]
+
+
+def free_port() -> int:
+    """Returns a TCP port that nothing is listening on"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode: str, port: int) -> subprocess.Popen:
+    """Starts gunicorn with the worker class and waits until it is healthy"""
+    env = dict(
+        os.environ,
+        GUNICORN_WORKER_CLASS=mode,
+        GUNICORN_BIND=f"127.0.0.1:{port}",
+        GUNICORN_LOG_LEVEL="warning",
+    )
+    server = subprocess.Popen(  # pylint: disable=consider-using-with
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "-c",
+            "gunicorn.conf.py",
+            "service:create_app()",
+        ],
+        env=env,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            if connection.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"gunicorn with {mode} workers did not start")
+
+
+def client(port: int, ids: list, stop: float, latencies: list):
+    """Sends requests over one keep-alive connection until the stop time"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    while time.monotonic() < stop:
+        if random.random() < 0.5:
+            path = f"/products/{random.choice(ids)}"
+        else:
+            path = "/products?limit=20&available=true"
+        start = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            # sync workers close the connection after every response
+            connection.close()
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    connection.close()
+
+
+def measure(port: int, ids: list, clients: int, seconds: float) -> tuple:
+    """Returns the requests per second and p99 latency in ms of the clients"""
+    latencies = []
+    stop = time.monotonic() + seconds
+    workers = [
+        threading.Thread(target=client, args=(port, ids, stop, latencies))
+        for _ in range(clients)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] if latencies else 0.0
+    return len(latencies) / seconds, p99 * 1000
+
+
+def main():
+    """Runs the benchmark for every requested worker class"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modes", nargs="+", default=["sync", "gthread", "gevent"])
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10)
+    args = parser.parse_args()
+    app = create_app()
+    app.logger.setLevel(logging.CRITICAL)
+    init_db(app)
+
+    ids = seed(args.rows)
+    db.session.remove()
+    print(f"{'mode':>8} {'req/s':>8} {'p99 (ms)':>9}")
+    for mode in args.modes:
+        port = free_port()
+        server = start_server(mode, port)
+        try:
+            measure(port, ids, args.clients, 1)  # warm up
+            throughput, p99 = measure(port, ids, args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{mode:>8} {throughput:>8.0f} {p99:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+List Serialization Benchmark
+
+Compares the cost of turning a product listing into a JSON body with
+Product ORM instances and serialize() against plain rows from
+Product.rows() rendered by json.dumps with encode_json().
+
+Usage:
+    DATABASE_URI=sqlite:////tmp/bench.db python -m benchmarks.list_serialization
+    python -m benchmarks.list_serialization --rows 10000 100000 --repeat 5
+
+WARNING: the benchmark deletes every Product in the configured database.
+"""
+import argparse
+import json
+import logging
+import time
+from service import create_app
+from service.models import db, init_db, Product
+from service.routes import encode_json
+from tests.factories import ProductFactory
+
+app = create_app()
+
+
+def orm_path() -> str:
+    """Builds the listing body from Product instances"""
+    return json.dumps([product.serialize() for product in Product.query])
+
+
+def rows_path() -> str:
+    """Builds the listing body from plain rows"""
+    rows = Product.rows()
+    results = [dict(zip(Product.FIELDS, row)) for row in rows]
+    return json.dumps(results, default=encode_json)
+
+
+def seed(count: int):
+    """Replaces the Products in the database with count fake ones"""
+    db.session.query(Product).delete()
+    db.session.commit()
+    for start in range(0, count, app.config["BATCH_SIZE_MAX"]):
+        size = min(app.config["BATCH_SIZE_MAX"], count - start)
+        Product.create_batch(ProductFactory.build_batch(size))
+
+
+def best_of(function, repeat: int) -> float:
+    """Returns the fastest of repeat runs of function in seconds"""
+    timings = []
+    for _ in range(repeat):
+        db.session.remove()  # start every run with an empty identity map
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    """Runs the benchmark for every requested row count"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    app.logger.setLevel(logging.CRITICAL)
+    init_db(app)
+
+    print(f"{'rows':>8} {'orm (ms)':>10} {'rows (ms)':>10} {'speedup':>8}")
+    for count in args.rows:
+        seed(count)
+        assert json.loads(orm_path()) == json.loads(rows_path())
+        orm = best_of(orm_path, args.repeat)
+        rows = best_of(rows_path, args.repeat)
+        print(
+            f"{count:>8} {orm * 1000:>10.1f} {rows * 1000:>10.1f} {orm / rows:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
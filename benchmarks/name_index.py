@@ -0,0 +1,99 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Name Index Benchmark
+
+Measures how long the autocomplete NameIndex takes to rebuild from fake
+product names, and to answer prefix lookups and lookups with a typo.
+
+Usage:
+    python -m benchmarks.name_index
+    python -m benchmarks.name_index --names 100000 300000 --lookups 200
+"""
+import argparse
+import random
+import statistics
+import time
+from faker import Faker
+from service.common.name_index import NameIndex
+
+
+def fake_names(count: int) -> list:
+    """Returns count product like names of one to three words"""
+    fake = Faker()
+    Faker.seed(count)
+    return [
+        " ".join(fake.word().title() for _ in range(random.randint(1, 3)))
+        for _ in range(count)
+    ]
+
+
+def add_typo(text: str) -> str:
+    """Swaps two adjacent letters of the text"""
+    letters = list(text)
+    position = random.randrange(len(letters) - 1)
+    letters[position], letters[position + 1] = letters[position + 1], letters[position]
+    return "".join(letters)
+
+
+def timed_lookups(index: NameIndex, prefixes: list) -> list:
+    """Returns the time of each lookup in milliseconds"""
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def main():
+    """Runs the benchmark for every requested number of names"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--names", type=int, nargs="+", default=[100_000, 300_000])
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+    random.seed(0)
+
+    print(
+        f"{'names':>8} {'rebuild (ms)':>13} {'step':>7} {'median (ms)':>12} {'p99 (ms)':>9}"
+    )
+    for count in args.names:
+        names = fake_names(count)
+        index = NameIndex()
+        start = time.perf_counter()
+        index.rebuild(enumerate(names))
+        rebuild = (time.perf_counter() - start) * 1000
+        # prefixes of four to eight letters of names in the index
+        prefixes = [
+            name[: random.randint(4, 8)]
+            for name in random.sample(names, args.lookups)
+            if len(name) >= 8
+        ]
+        steps = {
+            "prefix": prefixes,
+            "typo": [add_typo(prefix) for prefix in prefixes],
+        }
+        for step, lookups in steps.items():
+            timings = sorted(timed_lookups(index, lookups))
+            p99 = timings[int(len(timings) * 0.99)]
+            print(
+                f"{count:>8} {rebuild:>13.0f} {step:>7} "
+                f"{statistics.median(timings):>12.2f} {p99:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
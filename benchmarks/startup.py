@@ -0,0 +1,80 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Startup Benchmark
+
+Measures, in a fresh interpreter for every run, how long it takes to
+import the service package, to create the app with create_app() and to
+answer the first and second requests, which make the tables on first use.
+
+Usage:
+    DATABASE_URI=sqlite:////tmp/bench.db python -m benchmarks.startup
+    python -m benchmarks.startup --repeat 20
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+# Runs in the fresh interpreter and prints the cumulative times in seconds
+PROBE = """
+import json, time
+start = time.perf_counter()
+import service
+imported = time.perf_counter()
+app = service.create_app()
+created = time.perf_counter()
+client = app.test_client()
+client.get("/health")
+first = time.perf_counter()
+client.get("/health")
+second = time.perf_counter()
+print(json.dumps({
+    "import service": imported - start,
+    "create_app()": created - imported,
+    "first request": first - created,
+    "second request": second - first,
+}))
+"""
+
+
+def run_probe() -> dict:
+    """Returns the timings of one fresh interpreter"""
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    """Runs the probe repeatedly and prints the median and best of each step"""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [run_probe() for _ in range(args.repeat)]
+    print(f"{'step':>16} {'median (ms)':>12} {'best (ms)':>10}")
+    for step in runs[0]:
+        timings = [run[step] * 1000 for run in runs]
+        print(f"{step:>16} {statistics.median(timings):>12.1f} {min(timings):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -28,20 +28,16 @@ from behave import given
 # HTTP Return Codes
 HTTP_200_OK = 200
 HTTP_201_CREATED = 201
-HTTP_204_NO_CONTENT = 204
 
 @given('the following products')
 def step_impl(context):
     """ Delete all Products and load new ones """
     #
-    # List all of the products and delete them one by one
+    # Delete all of the products with a single request
     #
     rest_endpoint = f"{context.base_url}/products"
-    context.resp = requests.get(rest_endpoint)
+    context.resp = requests.delete(f"{rest_endpoint}?all=true")
     assert(context.resp.status_code == HTTP_200_OK)
-    for product in context.resp.json():
-        context.resp = requests.delete(f"{rest_endpoint}/{product['id']}")
-        assert(context.resp.status_code == HTTP_204_NO_CONTENT)
 
     #
     # load the database with new products
@@ -0,0 +1,157 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+# spell: ignore gthread gevent psycogreen
+# gunicorn settings are lower case module variables
+# pylint: disable=invalid-name
+"""
+Gunicorn configuration for the Product service
+
+Gunicorn reads this file from the working directory on start up. Every
+setting can be changed from the environment:
+
+    GUNICORN_WORKER_CLASS         sync, gthread (default) or gevent
+    WEB_CONCURRENCY               worker processes, derived from the CPUs if unset
+    GUNICORN_THREADS              threads per gthread worker (default 4)
+    GUNICORN_WORKER_CONNECTIONS   clients per gevent worker (default 1000)
+    GUNICORN_PRELOAD              import the app once before forking (default true,
+                                  false and not allowed for gevent)
+    GUNICORN_MAX_REQUESTS         requests before a worker is recycled (default 1000)
+    GUNICORN_MAX_REQUESTS_JITTER  random extra requests per worker (default 100)
+    GUNICORN_TIMEOUT              seconds before a silent worker is killed (default 30)
+    GUNICORN_KEEPALIVE            seconds an idle connection is kept open (default 5)
+    GUNICORN_BIND                 address to listen on (default 0.0.0.0:$PORT)
+    PROMETHEUS_MULTIPROC_DIR      where workers write their /metrics (default a temp dir)
+
+Sync workers serve one request at a time and suit CPU bound work. Gthread
+workers serve GUNICORN_THREADS requests each and keep idle connections
+open, so each worker's DB_POOL_SIZE + DB_MAX_OVERFLOW should be at least
+GUNICORN_THREADS. Gevent workers serve many slow clients on greenlets and
+need psycogreen so that psycopg2 yields while it waits for PostgreSQL.
+Gevent only patches threading when a worker starts, so gevent workers load
+the app themselves: an app preloaded in the master would keep the real OS
+locks it created, and a greenlet holding one across a query would block
+every other greenlet of its worker, which can deadlock.
+
+Throughput of the default worker count for each class, measured with
+benchmarks.gunicorn_workers on a single CPU shared with the clients, SQLite
+and 32 concurrent keep-alive clients mixing single Product reads with pages
+of 20 Products, over repeated runs of 10 seconds:
+
+    sync      3 workers             260-290 req/s   p99  160-330 ms
+    gthread   2 workers x 4 threads 240-255 req/s   p99  250-560 ms
+    gevent    1 worker              230-265 req/s   p99 1690-1900 ms
+
+On one CPU every class is bound by the CPU, so they reach about the same
+throughput and gevent pays for serving every client from one process with
+its tail latency. Gthread and gevent pull ahead once requests spend their
+time waiting on a remote PostgreSQL rather than on the CPU.
+
+Numbers depend heavily on the hardware and the database, so rerun the
+benchmark on the target machine before changing the defaults.
+"""
+import glob
+import multiprocessing
+import os
+import tempfile
+
+
+def as_flag(value: str) -> bool:
+    """Converts an environment variable to a boolean"""
+    return value.lower() in ["true", "yes", "1"]
+
+
+# worker processes per CPU for each worker class, plus one
+WORKERS_PER_CPU = {"sync": 2, "gthread": 1, "gevent": 0}
+
+cpu_count = multiprocessing.cpu_count()
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+if worker_class not in WORKERS_PER_CPU:
+    raise RuntimeError(
+        f"GUNICORN_WORKER_CLASS must be one of {', '.join(WORKERS_PER_CPU)}"
+    )
+workers = int(
+    os.getenv("WEB_CONCURRENCY", str(WORKERS_PER_CPU[worker_class] * cpu_count + 1))
+)
+threads = int(os.getenv("GUNICORN_THREADS", "4")) if worker_class == "gthread" else 1
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "1000"))
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '8080')}")
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+
+# import the app, and its dependencies, once in the master so that workers
+# start quickly and share the memory of the loaded modules; gevent workers
+# must import it after patching so that its locks cooperate with greenlets
+preload_app = as_flag(
+    os.getenv("GUNICORN_PRELOAD", "false" if worker_class == "gevent" else "true")
+)
+if preload_app and worker_class == "gevent":
+    raise RuntimeError("GUNICORN_PRELOAD is not supported with gevent workers")
+
+# recycle workers to contain slow memory growth, at random points so
+# they do not all restart at the same time
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "1000"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "100"))
+
+# heartbeat files on a RAM disk do not stall workers on slow container disks
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+# every worker writes its Prometheus metrics to files in this directory so
+# that /metrics can add them up; it must be set before the app is imported
+metrics_dir = os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR",
+    os.path.join(tempfile.gettempdir(), "products-prometheus"),
+)
+os.makedirs(metrics_dir, exist_ok=True)
+
+
+def on_starting(server):  # pylint: disable=unused-argument
+    """Clears the metrics left behind by the last run"""
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def post_fork(server, worker):  # pylint: disable=unused-argument
+    """Prepares a newly forked worker to use the database"""
+    if worker_class == "gevent":
+        try:
+            # pylint: disable=import-outside-toplevel
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning("psycogreen is missing, queries will block gevent")
+        else:
+            patch_psycopg()
+    if preload_app:
+        # connections the master may have opened while loading the app must
+        # not be shared, so the worker drops them from its copy of every pool
+        # pylint: disable=import-outside-toplevel
+        from service.models import db
+
+        with server.app.wsgi().app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False)
+
+
+def child_exit(server, worker):  # pylint: disable=unused-argument
+    """Drops the gauges of a worker that has exited from /metrics"""
+    # pylint: disable=import-outside-toplevel
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -18,41 +18,53 @@
 Package: service
 
 Package for the application models and service routes
-This module creates and configures the Flask app and sets up the logging
-and SQL database
+This module provides create_app() which creates and configures the Flask
+app and sets up the logging and SQL database. Importing the package does
+not create an app or connect to the database.
 """
-import sys
-from flask import Flask
 from service import config
 from service.common import log_handlers
 
-# NOTE: Do not change the order of this code
-# The Flask app must be created
-# BEFORE you import modules that depend on it !!!
 
-# Create the Flask aoo
-app = Flask(__name__)  # pylint: disable=invalid-name
+def create_app(settings: dict = None):
+    """Creates and configures the Flask app
 
-# Load Configurations
-app.config.from_object(config)
+    The database is not touched until the first request needs it, so
+    creating the app is cheap for the flask CLI, tests and gunicorn workers.
 
-# Dependencies require we import the routes AFTER the Flask app is created
-# pylint: disable=wrong-import-position, wrong-import-order, cyclic-import
-from service import routes, models  # noqa: F401, E402
-from service.common import error_handlers, cli_commands  # noqa: F401, E402
+    :param settings: configuration that overrides service.config
+    :type settings: dict
 
-# Set up logging for production
-log_handlers.init_logging(app, "gunicorn.error")
+    :return: the configured app
+    :rtype: Flask
 
-app.logger.info(70 * "*")
-app.logger.info("  P E T   S E R V I C E   R U N N I N G  ".center(70, "*"))
-app.logger.info(70 * "*")
+    """
+    # Flask and the modules that make up the service are only imported once
+    # an app is created so that importing the package stays cheap
+    # pylint: disable=import-outside-toplevel, cyclic-import
+    from flask import Flask
+    from service import routes, models
+    from service.common import error_handlers, cli_commands, metrics, timing
 
-try:
-    models.init_db(app)  # make our sqlalchemy tables
-except Exception as error:  # pylint: disable=broad-except
-    app.logger.critical("%s: Cannot continue", error)
-    # gunicorn requires exit code 4 to stop spawning workers when they die
-    sys.exit(4)
+    app = Flask(__name__)
+    app.config.from_object(config)
+    app.config.update(settings or {})
 
-app.logger.info("Service initialized!")
+    # metrics and timing first so that the request timings include the other hooks
+    app.register_blueprint(metrics.blueprint)
+    app.register_blueprint(timing.blueprint)
+    app.register_blueprint(routes.blueprint)
+    app.register_blueprint(error_handlers.blueprint)
+    app.register_blueprint(cli_commands.blueprint)
+
+    # Set up logging for production
+    log_handlers.init_logging(app, "gunicorn.error")
+
+    app.logger.info(70 * "*")
+    app.logger.info("  P E T   S E R V I C E   R U N N I N G  ".center(70, "*"))
+    app.logger.info(70 * "*")
+
+    models.init_app(app)
+
+    app.logger.info("Service initialized!")
+    return app
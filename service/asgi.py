@@ -0,0 +1,393 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+# spell: ignore asyncpg aiosqlite uvicorn
+"""
+Product Store Service for ASGI servers
+
+An asyncio edition of the Product CRUD routes in service/routes.py built on
+Quart and the asyncio extension of SQLAlchemy. An idle keep-alive connection
+only costs a socket in the event loop, and a request waiting on the database
+does not hold a worker, so one process can serve many slow clients.
+
+The Product model, its validation and the query string parsing are shared
+with the WSGI service, and listings carry the same ETag, X-Total-Count and
+paging headers and can be streamed as NDJSON. Search, suggestions,
+statistics, analytics, batches and bulk changes are only served by the WSGI
+service and answered with 501 Not Implemented here.
+
+This edition neither reads nor updates the in-memory caches of the WSGI
+service, which lives in other processes. While both serve the same
+database, a WSGI process does not see the writes made here in its Product
+cache, statistics, name index and analytics snapshot until they expire
+after CACHE_TTL, STATS_CACHE_TTL, SUGGEST_REFRESH_SECONDS and
+SNAPSHOT_REFRESH_SECONDS. The listing ETags are kept by the database and
+stay correct.
+
+Run it with an ASGI server, for example:
+
+    uvicorn service.asgi:app --host 0.0.0.0 --port $PORT
+"""
+import json
+from quart import Quart, jsonify, request, abort, make_response, url_for, Response
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import create_async_engine
+from werkzeug.exceptions import HTTPException
+from service import config
+from service.common import status  # HTTP Status Codes
+from service.models import Product, DataValidationError, db
+from service.models import ESTIMATE_COUNT, product_generation
+from service.common.error_handlers import error_response
+from service.common.generation import DIALECTS as GENERATION_DIALECTS
+from service.common.generation import generation_query
+from service.routes import product_filters, requested_fields, if_match_version
+from service.routes import encode_cursor, decode_cursor, encode_json, product_etag
+from service.routes import parse_limit, abort_not_found, abort_update
+from service.routes import collection_etag, wants_ndjson, ndjson_line
+from service.routes import exact_count, sends_total_count
+
+app = Quart(__name__)
+app.config.from_object(config)
+
+product_table = Product.__table__
+
+
+######################################################################
+# D A T A B A S E   E N G I N E
+######################################################################
+@app.before_serving
+async def connect():
+    """Creates the asyncio database engine and makes the tables"""
+    app.engine = create_async_engine(
+        app.config["ASYNC_DATABASE_URI"], **app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    )
+    async with app.engine.begin() as connection:
+        await connection.run_sync(db.metadata.create_all)
+
+
+@app.after_serving
+async def disconnect():
+    """Closes every connection in the pool"""
+    await app.engine.dispose()
+
+
+######################################################################
+# E R R O R   H A N D L E R S
+######################################################################
+@app.errorhandler(DataValidationError)
+async def request_validation_error(error):
+    """Handles Value Errors from bad data"""
+    app.logger.warning(str(error))
+    return error_response(status.HTTP_400_BAD_REQUEST, "Bad Request", error)
+
+
+@app.errorhandler(HTTPException)
+async def http_error(error):
+    """Handles aborted requests with the same JSON body as the WSGI service"""
+    app.logger.warning(str(error))
+    return error_response(error.code, error.name, error)
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def check_content_type(content_type):
+    """Checks that the media type is correct"""
+    if request.headers.get("Content-Type") != content_type:
+        app.logger.error(
+            "Invalid Content-Type: %s", request.headers.get("Content-Type")
+        )
+        abort(
+            status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            f"Content-Type must be {content_type}",
+        )
+
+
+def page_limit():
+    """Returns the page size requested in the query string, or None for all rows"""
+    if "limit" not in request.args and "cursor" not in request.args:
+        return None
+    limit = request.args.get("limit", str(app.config["PAGE_SIZE_DEFAULT"]))
+    return parse_limit(limit, app.config["PAGE_SIZE_MAX"])
+
+
+async def not_modified(etag: str):
+    """Returns a 304 response if the client already holds this entity tag"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    app.logger.info("Entity tag %s not modified", etag)
+    response = await make_response("", status.HTTP_304_NOT_MODIFIED)
+    response.set_etag(etag)
+    return response
+
+
+async def fetch_generation(connection):
+    """Returns the generation of the Products, or None if the database keeps none"""
+    if connection.dialect.name not in GENERATION_DIALECTS:
+        return None
+    return (await connection.execute(generation_query(product_generation))).scalar()
+
+
+async def count_rows(connection, criteria: list, exact: bool) -> int:
+    """Returns the number of Products matching the criteria like Product.count()"""
+    # pylint: disable=not-callable
+    if not criteria and not exact and connection.dialect.name == "postgresql":
+        estimate = (
+            await connection.execute(ESTIMATE_COUNT, {"name": product_table.name})
+        ).scalar()
+        if estimate is not None and estimate >= 0:
+            return int(estimate)
+    statement = select(func.count(product_table.c.id)).where(*criteria)
+    return (await connection.execute(statement)).scalar()
+
+
+async def fetch_product(connection, product_id: int):
+    """Returns the Product with the id, or None if there is none"""
+    statement = select(product_table).where(product_table.c.id == product_id)
+    row = (await connection.execute(statement)).mappings().first()
+    return Product(**row) if row else None
+
+
+######################################################################
+# H E A L T H   C H E C K
+######################################################################
+@app.route("/health")
+async def healthcheck():
+    """Let them know our heart is still beating"""
+    return jsonify(status=200, message="OK"), status.HTTP_200_OK
+
+
+######################################################################
+# C R E A T E   A   N E W   P R O D U C T
+######################################################################
+@app.route("/products", methods=["POST"])
+async def create_products():
+    """
+    Creates a Product
+    This endpoint will create a Product based the data in the body that is posted
+    """
+    app.logger.info("Request to Create a Product...")
+    check_content_type("application/json")
+
+    data = await request.get_json()
+    app.logger.info("Processing: %s", data)
+    product = Product().deserialize(data)
+    statement = insert(product_table).returning(*product_table.columns)
+    async with app.engine.begin() as connection:
+        result = await connection.execute(statement, product.writable_values())
+        product = Product(**result.mappings().one())
+    app.logger.info("Product with new id [%s] saved!", product.id)
+
+    location_url = url_for("get_products", product_id=product.id, _external=True)
+    return (
+        jsonify(product.serialize()),
+        status.HTTP_201_CREATED,
+        {"Location": location_url},
+    )
+
+
+######################################################################
+# L I S T   A L L   P R O D U C T S
+######################################################################
+@app.route("/products", methods=["GET", "HEAD"])
+async def list_products():
+    """Returns a list of Products, a page at a time when limit or cursor is given"""
+    app.logger.info("Request to list Products...")
+    if request.args.get("q", "").strip():
+        abort(status.HTTP_400_BAD_REQUEST, "Search is not supported by this service")
+    filters = product_filters(request.args)
+    app.logger.info("Find by filters: %s", filters)
+    if request.method == "HEAD":
+        return await count_products(filters)
+    ndjson = wants_ndjson(request.accept_mimetypes)
+    response, headers = await listing_headers(filters, ndjson)
+    if response:
+        return response
+    fields = requested_fields(request.args)
+    limit = page_limit()
+    statement = page_statement(filters, fields, limit)
+    if ndjson and limit is None:
+        app.logger.info("Streaming Products as NDJSON")
+        return stream_ndjson(statement, fields), status.HTTP_200_OK, headers
+    async with app.engine.connect() as connection:
+        rows = (await connection.execute(statement)).all()
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        headers.update(next_page_headers(rows[-1].id, limit))
+    app.logger.info("[%s] Products returned", len(rows))
+    if ndjson:
+        body = "".join(ndjson_line(fields, row) for row in rows)
+        return (
+            Response(body, mimetype="application/x-ndjson"),
+            status.HTTP_200_OK,
+            headers,
+        )
+    body = json.dumps([dict(zip(fields, row)) for row in rows], default=encode_json)
+    return Response(body, mimetype="application/json"), status.HTTP_200_OK, headers
+
+
+async def count_products(filters: dict) -> Response:
+    """Returns an empty response with the number of Products matching the filters"""
+    async with app.engine.connect() as connection:
+        total = await count_rows(
+            connection, Product.filter_criteria(**filters), exact_count(request.args)
+        )
+    app.logger.info("Counted [%s] Products", total)
+    response = Response("", status=status.HTTP_200_OK, mimetype="application/json")
+    response.headers["X-Total-Count"] = str(total)
+    return response
+
+
+async def listing_headers(filters: dict, ndjson: bool) -> tuple:
+    """Returns a 304 response, or the ETag and X-Total-Count headers of a listing"""
+    headers = {}
+    async with app.engine.connect() as connection:
+        generation = await fetch_generation(connection)
+        if generation is not None:
+            etag = collection_etag(request.full_path, ndjson, generation)
+            response = await not_modified(etag)
+            if response:
+                return response, headers
+            headers["ETag"] = f'"{etag}"'
+        if sends_total_count(request.args, bool(filters)):
+            total = await count_rows(
+                connection,
+                Product.filter_criteria(**filters),
+                exact_count(request.args),
+            )
+            headers["X-Total-Count"] = str(total)
+    return None, headers
+
+
+def page_statement(filters: dict, fields: tuple, limit):
+    """Returns the statement selecting the requested page of the listing"""
+    # the id is always selected last for the paging cursor
+    columns = fields if "id" in fields else fields + ("id",)
+    statement = (
+        select(*[product_table.c[name] for name in columns])
+        .where(*Product.filter_criteria(**filters))
+        .order_by(product_table.c.id)
+    )
+    after_id = decode_cursor(request.args.get("cursor"))
+    if after_id is not None:
+        statement = statement.where(product_table.c.id > after_id)
+    if limit is not None:
+        # fetch one extra row to find out if there is a next page
+        statement = statement.limit(limit + 1)
+    return statement
+
+
+def next_page_headers(last_id: int, limit: int) -> dict:
+    """Returns the headers that link to the page after the Product with the id"""
+    cursor = encode_cursor(last_id)
+    args = request.args.to_dict()
+    args.update(limit=limit, cursor=cursor)
+    next_url = url_for("list_products", _external=True, **args)
+    return {"Link": f'<{next_url}>; rel="next"', "X-Next-Cursor": cursor}
+
+
+def stream_ndjson(statement, fields: tuple) -> Response:
+    """Streams Product rows as newline delimited JSON as they come off the cursor"""
+    statement = statement.execution_options(yield_per=app.config["STREAM_BATCH_SIZE"])
+
+    async def generate():
+        async with app.engine.connect() as connection:
+            result = await connection.stream(statement)
+            async for row in result:
+                yield ndjson_line(fields, row)
+
+    return Response(generate(), mimetype="application/x-ndjson")
+
+
+######################################################################
+# R E A D   A   P R O D U C T
+######################################################################
+@app.route("/products/<int:product_id>", methods=["GET"])
+async def get_products(product_id):
+    """Reads a single Product"""
+    app.logger.info("Request to read Product with id: %s", product_id)
+    fields = requested_fields(request.args)
+    async with app.engine.connect() as connection:
+        product = await fetch_product(connection, product_id)
+    if not product:
+        abort(status.HTTP_404_NOT_FOUND, f"Product with id [{product_id}] not found.")
+    etag = product_etag(product, fields)
+    response = await not_modified(etag)
+    if response:
+        return response
+    data = product.serialize()
+    result = {name: data[name] for name in fields}
+    return jsonify(result), status.HTTP_200_OK, {"ETag": f'"{etag}"'}
+
+
+######################################################################
+# U P D A T E   A   P R O D U C T
+######################################################################
+@app.route("/products/<int:product_id>", methods=["PUT"])
+async def update_products(product_id):
+    """
+    Update a Product
+    This endpoint will update a Product based the body that is posted
+    """
+    app.logger.info("Request to Update a product with id [%s]", product_id)
+    check_content_type("application/json")
+    data = await request.get_json()
+    async with app.engine.begin() as connection:
+        try:
+            product = Product().deserialize(data)
+        except DataValidationError:
+            # a missing Product is reported before a bad request body
+            if not await fetch_product(connection, product_id):
+                abort_not_found(product_id)
+            raise
+        version = if_match_version(product_id, request.if_match)
+        statement = Product.update_statement(product_id, product, version)
+        row = (await connection.execute(statement)).mappings().first()
+    if not row:
+        abort_update(product_id, version)
+    product = Product(**row)
+    etag = product_etag(product)
+    return jsonify(product.serialize()), status.HTTP_200_OK, {"ETag": f'"{etag}"'}
+
+
+######################################################################
+# D E L E T E   A   P R O D U C T
+######################################################################
+@app.route("/products/<int:product_id>", methods=["DELETE"])
+async def delete_products(product_id):
+    """Deletes a Product"""
+    app.logger.info("Request to delete Product with id: %s", product_id)
+    statement = delete(product_table).where(product_table.c.id == product_id)
+    async with app.engine.begin() as connection:
+        result = await connection.execute(statement)
+    app.logger.info("[%s] Products deleted", result.rowcount)
+    return "", status.HTTP_204_NO_CONTENT
+
+
+######################################################################
+# W S G I   O N L Y   R O U T E S
+######################################################################
+@app.route("/products", methods=["PATCH", "DELETE"])
+@app.route("/products/batch", methods=["POST"])
+@app.route("/products/suggest", methods=["GET"])
+@app.route("/products/stats", methods=["GET"])
+@app.route("/products/analytics", methods=["GET"])
+async def wsgi_only():
+    """Refuses the routes that only the WSGI service serves"""
+    abort(
+        status.HTTP_501_NOT_IMPLEMENTED,
+        f"{request.method} {request.path} is only served by the WSGI service",
+    )
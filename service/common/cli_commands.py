@@ -1,15 +1,18 @@
 """
 Flask CLI Command Extensions
 """
-from service import app
+from flask import Blueprint
 from service.models import db
 
+# The commands are registered on the app by create_app(), without a group
+blueprint = Blueprint("commands", __name__, cli_group=None)
+
 
 ######################################################################
 # Command to force tables to be rebuilt
 # Usage: flask db-create
 ######################################################################
-@app.cli.command("db-create")
+@blueprint.cli.command("db-create")
 def db_create():
     """
     Recreates a local database. You probably should not use this on
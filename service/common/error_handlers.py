@@ -14,85 +14,82 @@
 """
 Module: error_handlers
 """
-from flask import jsonify
+import logging
+from flask import Blueprint
 from service.models import DataValidationError
-from service import app
 from . import status
 
+# The error handlers are registered on the app by create_app()
+blueprint = Blueprint("errors", __name__)
+
+logger = logging.getLogger(__name__)
+
+
+def error_response(code: int, error: str, message) -> tuple:
+    """Returns the JSON body and status code of an error for the WSGI and ASGI apps"""
+    return {"status": code, "error": error, "message": str(message)}, code
+
 
 ######################################################################
 # Error Handlers
 ######################################################################
-@app.errorhandler(DataValidationError)
+@blueprint.app_errorhandler(DataValidationError)
 def request_validation_error(error):
     """Handles Value Errors from bad data"""
     return bad_request(error)
 
 
-@app.errorhandler(status.HTTP_400_BAD_REQUEST)
+@blueprint.app_errorhandler(status.HTTP_400_BAD_REQUEST)
 def bad_request(error):
     """Handles bad requests with 400_BAD_REQUEST"""
     message = str(error)
-    app.logger.warning(message)
-    return (
-        jsonify(
-            status=status.HTTP_400_BAD_REQUEST, error="Bad Request", message=message
-        ),
-        status.HTTP_400_BAD_REQUEST,
-    )
+    logger.warning(message)
+    return error_response(status.HTTP_400_BAD_REQUEST, "Bad Request", message)
 
 
-@app.errorhandler(status.HTTP_404_NOT_FOUND)
+@blueprint.app_errorhandler(status.HTTP_404_NOT_FOUND)
 def not_found(error):
     """Handles resources not found with 404_NOT_FOUND"""
     message = str(error)
-    app.logger.warning(message)
-    return (
-        jsonify(status=status.HTTP_404_NOT_FOUND, error="Not Found", message=message),
-        status.HTTP_404_NOT_FOUND,
-    )
+    logger.warning(message)
+    return error_response(status.HTTP_404_NOT_FOUND, "Not Found", message)
 
 
-@app.errorhandler(status.HTTP_405_METHOD_NOT_ALLOWED)
+@blueprint.app_errorhandler(status.HTTP_405_METHOD_NOT_ALLOWED)
 def method_not_supported(error):
     """Handles unsupported HTTP methods with 405_METHOD_NOT_SUPPORTED"""
     message = str(error)
-    app.logger.warning(message)
-    return (
-        jsonify(
-            status=status.HTTP_405_METHOD_NOT_ALLOWED,
-            error="Method not Allowed",
-            message=message,
-        ),
-        status.HTTP_405_METHOD_NOT_ALLOWED,
+    logger.warning(message)
+    return error_response(
+        status.HTTP_405_METHOD_NOT_ALLOWED, "Method not Allowed", message
+    )
+
+
+@blueprint.app_errorhandler(status.HTTP_412_PRECONDITION_FAILED)
+def precondition_failed(error):
+    """Handles failed If-Match preconditions with 412_PRECONDITION_FAILED"""
+    message = str(error)
+    logger.warning(message)
+    return error_response(
+        status.HTTP_412_PRECONDITION_FAILED, "Precondition Failed", message
     )
 
 
-@app.errorhandler(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+@blueprint.app_errorhandler(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
 def mediatype_not_supported(error):
     """Handles unsupported media requests with 415_UNSUPPORTED_MEDIA_TYPE"""
     message = str(error)
-    app.logger.warning(message)
-    return (
-        jsonify(
-            status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
-            error="Unsupported media type",
-            message=message,
-        ),
-        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+    logger.warning(message)
+    return error_response(
+        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, "Unsupported media type", message
     )
 
 
-@app.errorhandler(status.HTTP_500_INTERNAL_SERVER_ERROR)
+@blueprint.app_errorhandler(status.HTTP_500_INTERNAL_SERVER_ERROR)
 def internal_server_error(error):
     """Handles unexpected server error with 500_SERVER_ERROR"""
     message = str(error)
-    app.logger.error(message)
-    return (
-        jsonify(
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            error="Internal Server Error",
-            message=message,
-        ),
-        status.HTTP_500_INTERNAL_SERVER_ERROR,
+    logger.error(message)
+    return error_response(
+        status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal Server Error", message
     )
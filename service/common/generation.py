@@ -0,0 +1,104 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Collection Generation
+
+This module contains a counter that database triggers bump in the same
+transaction as every INSERT, UPDATE and DELETE of a table, bulk statements
+and other clients included. Its total changes exactly when the rows of the
+table commit, so it can tag listings without reading them.
+
+A single counter row would be locked by every write until it commits, so
+all writes to the table would queue behind each other. PostgreSQL instead
+spreads the counter over SHARDS rows and each connection bumps the row of
+its own backend process, so concurrent transactions almost never touch the
+same row, and the total is the sum of the rows. SQLite only ever has one
+writer, so it keeps a single row. PostgreSQL bumps the counter once per
+statement and SQLite once per row. Other databases get the table but no
+triggers.
+"""
+from sqlalchemy import DDL, BigInteger, Column, Integer, Table, event, func, select
+
+# Rows the PostgreSQL counter is spread over, at least the connections that
+# write at the same time across every worker so that they rarely share one
+SHARDS = 64
+
+# Databases that keep the counter up to date
+DIALECTS = ("postgresql", "sqlite")
+
+POSTGRES_DDL = [
+    "INSERT INTO %(table)s (id, generation) "
+    f"SELECT id, 0 FROM generate_series(0, {SHARDS - 1}) AS id",
+    "CREATE FUNCTION %(table)s_bump() RETURNS trigger AS $$ BEGIN "
+    "UPDATE %(table)s SET generation = generation + 1 "
+    f"WHERE id = pg_backend_pid() %% {SHARDS}; RETURN NULL; END $$ "
+    "LANGUAGE plpgsql",
+    "CREATE TRIGGER %(table)s_bump AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE "
+    "ON {source} FOR EACH STATEMENT EXECUTE PROCEDURE %(table)s_bump()",
+]
+SQLITE_DDL = ["INSERT INTO %(table)s (id, generation) VALUES (1, 0)"] + [
+    f"CREATE TRIGGER %(table)s_{operation.lower()} AFTER {operation} ON {{source}} "
+    "BEGIN UPDATE %(table)s SET generation = generation + 1; END"
+    for operation in ("INSERT", "UPDATE", "DELETE")
+]
+SQLITE_DROP_DDL = [
+    f"DROP TRIGGER IF EXISTS %(table)s_{operation}"
+    for operation in ("insert", "update", "delete")
+]
+
+
+def generation_table(metadata, source: Table) -> Table:
+    """Returns the table counting the writes to the source table
+
+    The table and its triggers are made and dropped along with the others
+    of the metadata, always after the source table is made.
+    """
+    table = Table(
+        f"{source.name}_generation",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("generation", BigInteger, nullable=False),
+    )
+    table.add_is_dependent_on(source)
+    for ddl in POSTGRES_DDL:
+        event.listen(
+            table,
+            "after_create",
+            DDL(ddl.format(source=source.name)).execute_if(dialect="postgresql"),
+        )
+    for ddl in SQLITE_DDL:
+        event.listen(
+            table,
+            "after_create",
+            DDL(ddl.format(source=source.name)).execute_if(dialect="sqlite"),
+        )
+    event.listen(
+        table,
+        "before_drop",
+        DDL("DROP FUNCTION IF EXISTS %(table)s_bump() CASCADE").execute_if(
+            dialect="postgresql"
+        ),
+    )
+    for ddl in SQLITE_DROP_DDL:
+        event.listen(table, "before_drop", DDL(ddl).execute_if(dialect="sqlite"))
+    return table
+
+
+def generation_query(table: Table):
+    """Returns the statement that reads the total of a generation table"""
+    # pylint: disable=not-callable
+    return select(func.sum(table.c.generation, type_=BigInteger))
@@ -0,0 +1,148 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Prometheus Metrics
+
+This module records the count, latency and status codes of requests per
+route, the requests in flight and the connection pool occupancy, and
+serves them on /metrics in the Prometheus text format.
+
+When PROMETHEUS_MULTIPROC_DIR is set, as gunicorn.conf.py does, every
+process writes its metrics to files in that directory and /metrics adds
+up the files of all the gunicorn workers, whichever worker is scraped.
+"""
+import os
+import threading
+import time
+import weakref
+from flask import Blueprint, Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry
+from prometheus_client import Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+from service.common.pool import MeteredQueuePool
+from service.models import db
+
+# The metrics are recorded for every request of the app by create_app()
+blueprint = Blueprint("metrics", __name__)
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route, method and status code",
+    ["route", "method", "status"],
+)
+LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling HTTP requests by route and method",
+    ["route", "method"],
+)
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests being handled",
+    multiprocess_mode="livesum",
+)
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Database connections of the pool by state",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+POOL_CHECKOUTS = Counter(
+    "db_pool_checkouts", "Connections checked out of the database pool"
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts", "Checkouts that timed out waiting for a connection"
+)
+POOL_WAIT = Counter(
+    "db_pool_checkout_wait_seconds", "Time spent waiting to check out connections"
+)
+
+# the pool counters last copied into the Prometheus counters, per pool
+pool_totals = weakref.WeakKeyDictionary()
+pool_totals_lock = threading.Lock()
+
+
+######################################################################
+#  R E Q U E S T   H O O K S
+######################################################################
+@blueprint.before_app_request
+def start_timer():
+    """Notes when the request started and counts it as in flight"""
+    g.request_start = time.perf_counter()
+    IN_FLIGHT.inc()
+
+
+@blueprint.after_app_request
+def record_request(response):
+    """Records the latency and status code of the request"""
+    if "request_start" in g:
+        route = route_name()
+        elapsed = time.perf_counter() - g.request_start
+        LATENCY.labels(route, request.method).observe(elapsed)
+        REQUESTS.labels(route, request.method, str(response.status_code)).inc()
+        record_pool(db.engine.pool)
+    return response
+
+
+@blueprint.teardown_app_request
+def end_request(_error):
+    """Stops counting the request as in flight"""
+    if g.pop("request_start", None) is not None:
+        IN_FLIGHT.dec()
+
+
+######################################################################
+#  M E T R I C S   E N D P O I N T
+######################################################################
+@blueprint.route("/metrics")
+def metrics():
+    """Returns the metrics of every worker in the Prometheus text format"""
+    registry = REGISTRY
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def route_name() -> str:
+    """Returns the view function that handled the request, without its blueprint"""
+    if request.endpoint is None:
+        return "unmatched"
+    return request.endpoint.rpartition(".")[2]
+
+
+def record_pool(pool):
+    """Copies the occupancy and counters of a metered pool into the metrics"""
+    if not isinstance(pool, MeteredQueuePool):
+        return
+    POOL_CONNECTIONS.labels("checked_in").set(pool.checkedin())
+    POOL_CONNECTIONS.labels("checked_out").set(pool.checkedout())
+    # overflow() is negative while the pool has unused capacity
+    POOL_CONNECTIONS.labels("overflow").set(max(pool.overflow(), 0))
+    # the pool keeps running totals, so only what changed since the last
+    # request is added to the counters
+    with pool_totals_lock:
+        totals = (pool.checkouts, pool.timeouts, pool.wait_seconds)
+        last = pool_totals.get(pool, (0, 0, 0.0))
+        for counter, total, previous in zip(
+            (POOL_CHECKOUTS, POOL_TIMEOUTS, POOL_WAIT), totals, last
+        ):
+            if total > previous:
+                counter.inc(total - previous)
+        pool_totals[pool] = totals
@@ -0,0 +1,227 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Name Index
+
+This module contains an in-memory index over names that answers prefix
+lookups for autocomplete and falls back to edit distance for typos.
+
+Distinct names are kept in a sorted list so a prefix lookup is a binary
+search followed by a short scan, and an index of the trigrams at the start
+of every name narrows down the candidates that need an edit distance check.
+"""
+import bisect
+from collections import Counter, defaultdict
+
+from service.common.reloadable import Reloadable
+
+# Most names sharing trigrams with a mistyped prefix to check edit distance for
+FUZZY_CANDIDATES = 100
+
+# Only the start of a name is compared with a prefix, so only the trigrams
+# of its first letters are indexed
+TRIGRAM_WINDOW = 16
+
+
+class NameIndex(Reloadable):
+    """In-memory prefix index over names with typo tolerant lookup"""
+
+    def __init__(self, max_age: float = 300.0):
+        super().__init__(max_age)
+        self._names_by_id = {}
+        self._counts = {}
+        self._sorted = []
+        self._trigrams = {}
+
+    ##################################################
+    # MAINTENANCE
+    ##################################################
+
+    def _build(self, rows):
+        """Returns the index of the (id, name) rows, built in one pass"""
+        names_by_id = dict(rows)
+        counts = Counter(names_by_id.values())
+        names_by_trigram = defaultdict(set)
+        for name in counts:
+            for trigram in trigrams(name):
+                names_by_trigram[trigram].add(name)
+        ordered = sorted((name.lower(), name) for name in counts)
+        return names_by_id, counts, ordered, names_by_trigram
+
+    def _swap(self, contents):
+        self._names_by_id, self._counts, self._sorted, self._trigrams = contents
+
+    def add(self, item_id, name: str):
+        """Adds or renames the item with the given id"""
+        with self._lock:
+            if self._record(item_id, name):
+                self._apply(item_id, name)
+
+    def remove(self, item_id):
+        """Removes the item with the given id"""
+        with self._lock:
+            if self._record(item_id, None):
+                self._apply(item_id, None)
+
+    def _apply(self, *change):
+        item_id, name = change
+        self._remove(item_id)
+        if name is not None:
+            self._add(item_id, name)
+
+    def _add(self, item_id, name: str):
+        self._names_by_id[item_id] = name
+        count = self._counts.get(name, 0)
+        self._counts[name] = count + 1
+        if count == 0:
+            bisect.insort(self._sorted, (name.lower(), name))
+            for trigram in trigrams(name):
+                self._trigrams.setdefault(trigram, set()).add(name)
+
+    def _remove(self, item_id):
+        name = self._names_by_id.pop(item_id, None)
+        if name is None:
+            return
+        self._counts[name] -= 1
+        if self._counts[name] == 0:
+            del self._counts[name]
+            position = bisect.bisect_left(self._sorted, (name.lower(), name))
+            del self._sorted[position]
+            for trigram in trigrams(name):
+                names = self._trigrams[trigram]
+                names.discard(name)
+                if not names:
+                    del self._trigrams[trigram]
+
+    ##################################################
+    # LOOKUPS
+    ##################################################
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        """Returns up to limit names that start with the prefix
+
+        When nothing starts with the prefix it is assumed to contain a typo
+        and names whose start is within a small edit distance of it are
+        returned instead, closest first.
+        """
+        key = prefix.lower()
+        with self._lock:
+            results = []
+            position = bisect.bisect_left(self._sorted, (key,))
+            while len(results) < limit and position < len(self._sorted):
+                lowered, name = self._sorted[position]
+                if not lowered.startswith(key):
+                    break
+                results.append(name)
+                position += 1
+            if not results:
+                results = self._fuzzy(key)[:limit]
+            return results
+
+    def _fuzzy(self, key: str) -> list:
+        """Returns names whose start is close to the key, closest first"""
+        if len(key) < 3:
+            return []
+        max_distance = 1 if len(key) < 6 else 2
+        key_trigrams = trigrams(key)
+        # a single edit, even swapping two letters, touches at most four trigrams
+        min_shared = max(1, len(key_trigrams) - 4 * max_distance)
+        shared = Counter()
+        for trigram, position in key_trigrams:
+            # a dropped or added letter moves the trigrams after it by one
+            names = set()
+            for shift in range(-max_distance, max_distance + 1):
+                names.update(self._trigrams.get((trigram, position + shift), ()))
+            shared.update(names)
+        candidates = [
+            name
+            for name, count in shared.most_common(FUZZY_CANDIDATES)
+            if count >= min_shared
+        ]
+        scored = []
+        for name in candidates:
+            lowered = name.lower()
+            closest = closest_start(key, lowered, max_distance)
+            if closest is not None:
+                scored.append((*closest, lowered, name))
+        return [name for *_, name in sorted(scored)]
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def trigrams(text: str) -> set:
+    """Returns the trigrams of the start padded, lower cased start of the text
+
+    Every trigram comes with its position so that only names sharing it
+    near the same place are counted as alike.
+    """
+    padded = "  " + text[:TRIGRAM_WINDOW].lower()
+    triples = zip(padded, padded[1:], padded[2:])
+    return {(trigram, i) for i, trigram in enumerate(map("".join, triples))}
+
+
+def closest_start(key: str, text: str, max_distance: int):
+    """Returns the edit distance and length difference of the closest start
+
+    Starts one letter shorter and one longer than the key are compared too,
+    to allow for a dropped or doubled letter, and starts of the same length
+    are preferred. None is returned when no start is within max_distance.
+    """
+    start = text[: len(key) + 1]
+    distances = prefix_edit_distances(key, start, max_distance)
+    if distances is None:
+        return None
+    closest = min(
+        (distances[length], abs(length - len(key)))
+        for length in range(min(len(key) - 1, len(start)), len(start) + 1)
+    )
+    return closest if closest[0] <= max_distance else None
+
+
+def edit_distance(source: str, target: str) -> int:
+    """Returns the edit distance between two strings
+
+    This is the Levenshtein distance extended so that swapping two adjacent
+    letters, the most common typing mistake, counts as a single edit.
+    """
+    return prefix_edit_distances(source, target)[-1]
+
+
+def prefix_edit_distances(source: str, target: str, limit: int = None) -> list:
+    """Returns the edit distances between the source and every start of the target
+
+    Item j is the distance to target[:j], so a single pass compares starts
+    of every length. With a limit, None is returned as soon as every
+    distance is known to be over it.
+    """
+    # the rows before the last two are no longer needed
+    before = previous = list(range(len(target) + 1))
+    for i, letter in enumerate(source, 1):
+        row = [i]
+        for j, other in enumerate(target, 1):
+            distance = min(
+                previous[j] + 1, row[j - 1] + 1, previous[j - 1] + (letter != other)
+            )
+            if i > 1 and j > 1 and letter == target[j - 2] and source[i - 2] == other:
+                distance = min(distance, before[j - 2] + 1)
+            row.append(distance)
+        # the next rows are built from the last two, which never shrinks them
+        if limit is not None and min(row) > limit and min(previous) > limit:
+            return None
+        before, previous = previous, row
+    return previous
@@ -0,0 +1,83 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Connection Pool Metrics
+
+This module contains a queue pool that records how long checkouts wait
+for a connection, so pools can be sized against the database or pgbouncer
+"""
+import threading
+import time
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that counts checkouts and times how long they wait"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._metrics_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._metrics_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            # includes opening a new connection when the pool has none idle
+            self._record_wait(time.perf_counter() - start)
+
+    def _record_wait(self, seconds: float):
+        with self._metrics_lock:
+            self.checkouts += 1
+            self.wait_seconds += seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, seconds)
+
+    def stats(self) -> dict:
+        """Returns the pool occupancy and the checkout wait counters"""
+        with self._metrics_lock:
+            checkouts = self.checkouts
+            average = self.wait_seconds / checkouts if checkouts else 0.0
+            return {
+                "size": self.size(),
+                "checked_in": self.checkedin(),
+                "checked_out": self.checkedout(),
+                # overflow() is negative while the pool has unused capacity
+                "overflow": max(self.overflow(), 0),
+                "checkouts": checkouts,
+                "timeouts": self.timeouts,
+                "checkout_wait_avg_ms": round(average * 1000, 3),
+                "checkout_wait_max_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def pool_stats(pool) -> dict:
+    """Returns the metrics of a pool, or just its status if it is not metered"""
+    if isinstance(pool, MeteredQueuePool):
+        return pool.stats()
+    return {"status": pool.status()}
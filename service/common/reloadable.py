@@ -0,0 +1,125 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Reloadable in-memory copies
+
+This module contains the base class of the in-memory copies of a table
+that are loaded on first use, kept up to date by the writes of this
+process and reloaded once they get too old.
+
+A reload reads every row, so only one thread does it at a time. Writes
+made while it reads are recorded and applied again to the new contents,
+and the other threads keep answering from the old contents meanwhile.
+"""
+import threading
+import time
+
+
+class Reloadable:
+    """Base class of in-memory copies of a table that are reloaded when old
+
+    Subclasses build new contents from rows with _build() without holding
+    the lock, install them with _swap() and apply a single recorded write
+    with _apply(); all three are called by rebuild().
+    """
+
+    def __init__(self, max_age: float = 300.0):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        # one rebuild at a time, and the writes made while it reads the rows
+        self._rebuild_lock = threading.RLock()
+        self._changes = None
+        self._loaded_at = None
+
+    @property
+    def is_stale(self) -> bool:
+        """True when the contents must be rebuilt before they can be queried"""
+        if self._loaded_at is None:
+            return True
+        return time.monotonic() - self._loaded_at > self.max_age
+
+    def refresh(self, load):
+        """Rebuilds the contents from the rows returned by load() when stale
+
+        If another thread is already rebuilding, this one carries on with
+        the old contents, or waits for the new ones when there are none yet,
+        instead of reading every row again.
+
+        :param load: returns the rows, preferably as a lazy query
+        :type load: callable
+
+        """
+        if not self.is_stale:
+            return
+        # pylint: disable=consider-using-with
+        if not self._rebuild_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self.is_stale:
+                self.rebuild(load())
+        finally:
+            self._rebuild_lock.release()
+
+    def rebuild(self, rows):
+        """Replaces the contents with the rows
+
+        The new contents are built without holding the lock, so queries
+        carry on against the old ones until they are swapped in. Writes made
+        while the rows are read are applied again afterwards, which covers
+        every write committed after a lazy query of the rows starts.
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                self._changes = []
+            contents = self._build(rows)
+            with self._lock:
+                changes, self._changes = self._changes, None
+                if changes is None:
+                    # invalidated while the rows were read, so they may be
+                    # missing writes that were not recorded one by one
+                    return
+                self._swap(contents)
+                for change in changes:
+                    self._apply(*change)
+                self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Marks the contents so they are rebuilt on the next query"""
+        with self._lock:
+            self._loaded_at = None
+            self._changes = None
+
+    def _record(self, *change) -> bool:
+        """Records a write for a running rebuild, must hold the lock
+
+        :return: True when the current contents must have the write applied
+        :rtype: bool
+
+        """
+        if self._changes is not None:
+            self._changes.append(change)
+        # until the first rebuild the database is the source of truth
+        return self._loaded_at is not None
+
+    def _build(self, rows):
+        raise NotImplementedError
+
+    def _swap(self, contents):
+        raise NotImplementedError
+
+    def _apply(self, *change):
+        raise NotImplementedError
@@ -0,0 +1,72 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Read Replica Routing
+
+This module contains the database session that sends reads marked as safe
+to the read replica bind and everything else to the primary
+"""
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql.expression import Executable
+
+# Name of the bind for the read replica in SQLALCHEMY_BINDS
+REPLICA_BIND = "replica"
+
+
+class RoutingSession(Session):
+    """Session that sends reads marked as safe to the read replica
+
+    Queries opt in with the replica execution option, or the replica bind
+    argument for Session.get(). Everything else, and every read made while
+    the transaction holds changes or info["primary"] is set, goes to the
+    primary database.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        # pylint: disable=too-many-boolean-expressions
+        replica = kwargs.pop(REPLICA_BIND, False)
+        if isinstance(clause, Executable):
+            replica = replica or clause.get_execution_options().get(REPLICA_BIND)
+        if (
+            replica
+            and bind is None
+            and REPLICA_BIND in self._db.engines
+            and not self.info.get("primary")
+            and not self.info.get("flushed")
+            and not (self.new or self.dirty or self.deleted)
+        ):
+            return self._db.engines[REPLICA_BIND]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def reads_replica(self, mapper=None) -> bool:
+        """Returns True if a read marked as safe would be sent to the replica"""
+        replica = self._db.engines.get(REPLICA_BIND)
+        return replica is not None and self.get_bind(mapper, replica=True) is replica
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def track_flush(session, _flush_context):
+    """Notes that the transaction has written to the primary"""
+    session.info["flushed"] = True
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def clear_flush(session, transaction):
+    """Lets reads go back to the replica once the changes are committed"""
+    if transaction.parent is None:
+        session.info.pop("flushed", None)
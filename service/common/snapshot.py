@@ -0,0 +1,222 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Columnar Snapshot
+
+This module contains an in-memory, column oriented copy of the catalog
+that answers filter and aggregate queries with vectorized NumPy operations
+instead of scanning the database.
+
+Every column is a NumPy array kept sorted by id: the id, the price in
+integer cents, the category code and an availability mask. A second mask
+marks the live rows so deletes are a single flag flip, and the arrays are
+compacted once more than half of their rows are dead.
+"""
+from decimal import Decimal
+
+import numpy as np
+
+from service.common.reloadable import Reloadable
+
+CENT = Decimal("0.01")
+
+# Column names and NumPy types, ids come first because rows are sorted by them
+COLUMNS = (
+    ("ids", np.int64),
+    ("cents", np.int64),
+    ("categories", np.int16),
+    ("available", np.bool_),
+    ("live", np.bool_),
+)
+
+
+class ColumnarSnapshot(Reloadable):
+    """In-memory columnar copy of the catalog with vectorized aggregates"""
+
+    def __init__(self, max_age: float = 300.0):
+        super().__init__(max_age)
+        self._columns = {}
+        self._size = 0
+        self._dead = 0
+        self._allocate(0)
+
+    ##################################################
+    # MAINTENANCE
+    ##################################################
+
+    def __len__(self) -> int:
+        return self._size - self._dead
+
+    def _build(self, rows):
+        """Returns the columns of the (id, price, category code, available) rows"""
+        ids, cents, categories, available = [], [], [], []
+        for item_id, price, category, is_available in rows:
+            ids.append(item_id)
+            cents.append(to_cents(price))
+            categories.append(category)
+            available.append(is_available)
+        order = np.argsort(np.array(ids, dtype=np.int64), kind="stable")
+        columns = {}
+        for (name, dtype), values in zip(
+            COLUMNS, [ids, cents, categories, available, [True] * len(ids)]
+        ):
+            columns[name] = np.array(values, dtype=dtype)[order]
+        return columns
+
+    def _swap(self, contents):
+        self._columns = contents
+        self._size = len(contents["ids"])
+        self._dead = 0
+
+    def add(self, item_id: int, price, category: int, available: bool):
+        """Adds the row with the given id or overwrites it in place"""
+        with self._lock:
+            if self._record(item_id, (price, category, available)):
+                self._apply(item_id, (price, category, available))
+
+    def remove(self, item_id: int):
+        """Removes the row with the given id"""
+        with self._lock:
+            if self._record(item_id, None):
+                self._apply(item_id, None)
+
+    def _apply(self, *change):
+        item_id, values = change
+        if values is None:
+            self._remove(item_id)
+        else:
+            self._add(item_id, *values)
+
+    def _add(self, item_id: int, price, category: int, available: bool):
+        values = (item_id, to_cents(price), category, available, True)
+        position = self._find(item_id)
+        if position < self._size and self._columns["ids"][position] == item_id:
+            if not self._columns["live"][position]:
+                self._dead -= 1
+        elif position == self._size:
+            # new ids are normally the largest so this is an append
+            if self._size == len(self._columns["ids"]):
+                self._grow()
+            self._size += 1
+        else:
+            for (name, _), value in zip(COLUMNS, values):
+                column = self._columns[name]
+                self._columns[name] = np.insert(column, position, value)
+            self._size += 1
+            return
+        for (name, _), value in zip(COLUMNS, values):
+            self._columns[name][position] = value
+
+    def _remove(self, item_id: int):
+        position = self._find(item_id)
+        if position == self._size or self._columns["ids"][position] != item_id:
+            return
+        if self._columns["live"][position]:
+            self._columns["live"][position] = False
+            self._dead += 1
+        if self._dead > self._size // 2:
+            self._compact()
+
+    def _find(self, item_id: int) -> int:
+        return int(np.searchsorted(self._columns["ids"][: self._size], item_id))
+
+    def _allocate(self, capacity: int):
+        self._columns = {
+            name: np.zeros(capacity, dtype=dtype) for name, dtype in COLUMNS
+        }
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._columns["ids"]))
+        for name, column in self._columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: self._size] = column[: self._size]
+            self._columns[name] = grown
+
+    def _compact(self):
+        live = self._columns["live"][: self._size]
+        for name, column in self._columns.items():
+            self._columns[name] = column[: self._size][live]
+        self._size = len(self._columns["ids"])
+        self._dead = 0
+
+    ##################################################
+    # QUERIES
+    ##################################################
+
+    def summary(self, **filters) -> dict:
+        """Returns price statistics of the matching rows, overall and by category
+
+        :param filters: category, available, min_price and max_price to match
+        :type filters: dict
+
+        :return: the statistics with per category figures keyed by code
+        :rtype: dict
+
+        """
+        with self._lock:
+            mask = self._mask(**filters)
+            cents = self._columns["cents"][: self._size][mask]
+            categories = self._columns["categories"][: self._size][mask]
+            available = self._columns["available"][: self._size][mask]
+        result = price_stats(cents, available)
+        result["categories"] = {
+            int(code): price_stats(
+                cents[categories == code], available[categories == code]
+            )
+            for code in np.unique(categories)
+        }
+        return result
+
+    def _mask(self, category=None, available=None, min_price=None, max_price=None):
+        mask = self._columns["live"][: self._size].copy()
+        if category is not None:
+            mask &= self._columns["categories"][: self._size] == category
+        if available is not None:
+            mask &= self._columns["available"][: self._size] == available
+        if min_price is not None:
+            mask &= self._columns["cents"][: self._size] >= to_cents(min_price)
+        if max_price is not None:
+            mask &= self._columns["cents"][: self._size] <= to_cents(max_price)
+        return mask
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def to_cents(price) -> int:
+    """Converts a price to a whole number of cents"""
+    return int((Decimal(str(price)) / CENT).to_integral_value())
+
+
+def from_cents(cents) -> Decimal:
+    """Converts a whole number of cents back to a price"""
+    return Decimal(int(cents)) * CENT
+
+
+def price_stats(cents, available) -> dict:
+    """Returns the count, available count and price statistics of the rows"""
+    count = len(cents)
+    stats = {"count": count, "available": int(np.count_nonzero(available))}
+    if count:
+        total = int(cents.sum())
+        stats.update(
+            min_price=from_cents(cents.min()),
+            max_price=from_cents(cents.max()),
+            avg_price=(from_cents(total) / count).quantize(CENT),
+            total_price=from_cents(total),
+        )
+    return stats
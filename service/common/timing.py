@@ -0,0 +1,106 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+
+"""
+Request Timing
+
+This module counts and times the SQL statements run by each request and
+reports them, with the time spent serializing and the total time, in a
+Server-Timing header. Requests that run more statements than
+SQL_STATEMENT_BUDGET are logged as a warning so that extra round trips
+show up as soon as they are introduced.
+
+Statements run while a streamed response is being sent come after the
+headers and are not included.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from flask import Blueprint, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# The timings are recorded for every request of the app by create_app()
+blueprint = Blueprint("timing", __name__)
+
+logger = logging.getLogger(__name__)
+
+
+######################################################################
+#  S Q L   S T A T E M E N T S
+######################################################################
+@event.listens_for(Engine, "before_cursor_execute")
+def start_statement(conn, _cursor, _statement, _parameters, _context, _executemany):
+    """Notes when a statement of a request was sent to the database"""
+    if has_request_context():
+        conn.info.setdefault("statement_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def end_statement(conn, _cursor, _statement, _parameters, _context, _executemany):
+    """Adds a finished statement to the timings of the request"""
+    starts = conn.info.get("statement_start")
+    if starts and has_request_context() and "timings" in g:
+        g.timings["db"] += time.perf_counter() - starts.pop()
+        g.statements += 1
+
+
+@contextmanager
+def timed(name: str):
+    """Adds the time spent in the with block to a timing of the request"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if "timings" in g:
+            g.timings[name] = g.timings.get(name, 0.0) + time.perf_counter() - start
+
+
+######################################################################
+#  R E Q U E S T   H O O K S
+######################################################################
+@blueprint.before_app_request
+def start_timings():
+    """Starts the timings of the request"""
+    g.timings = {"db": 0.0}
+    g.statements = 0
+    g.timings_start = time.perf_counter()
+
+
+@blueprint.after_app_request
+def add_server_timing(response):
+    """Reports the timings of the request in a Server-Timing header"""
+    if "timings" not in g:
+        return response
+    total = time.perf_counter() - g.timings_start
+    metrics = [f'db;dur={g.timings["db"] * 1000:.2f};desc="statements: {g.statements}"']
+    metrics += [
+        f"{name};dur={seconds * 1000:.2f}"
+        for name, seconds in g.timings.items()
+        if name != "db"
+    ]
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    response.headers["Server-Timing"] = ", ".join(metrics)
+    budget = current_app.config["SQL_STATEMENT_BUDGET"]
+    if g.statements > budget:
+        logger.warning(
+            "%s %s ran %s SQL statements, over the budget of %s",
+            request.method,
+            request.full_path.rstrip("?"),
+            g.statements,
+            budget,
+        )
+    return response
@@ -12,7 +12,81 @@ DATABASE_URI = os.getenv(
 # Configure SQLAlchemy
 SQLALCHEMY_DATABASE_URI = DATABASE_URI
 SQLALCHEMY_TRACK_MODIFICATIONS = False
-# SQLALCHEMY_POOL_SIZE = 2
+
+
+# Drivers used by the asyncio edition of the service in service/asgi.py
+ASYNC_DRIVERS = {
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def as_async_uri(uri: str) -> str:
+    """Swaps the database driver in a URI for its asyncio counterpart"""
+    scheme, separator, rest = uri.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+ASYNC_DATABASE_URI = os.getenv("ASYNC_DATABASE_URI", as_async_uri(DATABASE_URI))
+
+
+# Optional read replica for safe reads; a client's reads stay on the primary
+# for REPLICA_STICKY_SECONDS after it writes so it sees its own changes
+DATABASE_REPLICA_URI = os.getenv("DATABASE_REPLICA_URI")
+SQLALCHEMY_BINDS = {"replica": DATABASE_REPLICA_URI} if DATABASE_REPLICA_URI else {}
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "5"))
+
+
+def as_flag(value: str) -> bool:
+    """Converts an environment variable to a boolean"""
+    return value.lower() in ["true", "yes", "1"]
+
+
+# Connection pool, each option is only passed on when its variable is set
+# so that SQLAlchemy keeps its own defaults for the others
+SQLALCHEMY_ENGINE_OPTIONS = {
+    option: convert(os.environ[variable])
+    for option, variable, convert in [
+        ("pool_size", "DB_POOL_SIZE", int),
+        ("max_overflow", "DB_MAX_OVERFLOW", int),
+        ("pool_timeout", "DB_POOL_TIMEOUT", float),
+        ("pool_recycle", "DB_POOL_RECYCLE", int),
+        ("pool_pre_ping", "DB_POOL_PRE_PING", as_flag),
+    ]
+    if os.getenv(variable)
+}
+
+# Keyset pagination for product listings
+PAGE_SIZE_DEFAULT = int(os.getenv("PAGE_SIZE_DEFAULT", "100"))
+PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", "1000"))
+
+# Rows fetched per round trip when streaming listings as NDJSON
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Largest number of Products accepted by POST /products/batch
+BATCH_SIZE_MAX = int(os.getenv("BATCH_SIZE_MAX", "1000"))
+
+# Product name autocomplete
+SUGGEST_LIMIT_MAX = int(os.getenv("SUGGEST_LIMIT_MAX", "50"))
+SUGGEST_REFRESH_SECONDS = float(os.getenv("SUGGEST_REFRESH_SECONDS", "300"))
+
+# The caches, name index and snapshot below live in each WSGI process and
+# only see the writes of that process; writes made through the asyncio
+# edition (service/asgi.py) or by other clients show up once they expire
+
+# Read-through cache in front of Product.find()
+CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", "10000"))
+CACHE_TTL = float(os.getenv("CACHE_TTL", "30"))
+
+# Seconds before the in-memory catalog snapshot for analytics is reloaded
+SNAPSHOT_REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_SECONDS", "300"))
+
+# Seconds GET /products/stats may serve cached statistics; writes clear them
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "60"))
+
+# SQL statements a request may run before it is logged as a warning
+SQL_STATEMENT_BUDGET = int(os.getenv("SQL_STATEMENT_BUDGET", "10"))
 
 # Secret for session management
 SECRET_KEY = os.getenv("SECRET_KEY", "sup3r-s3cr3t")
@@ -29,15 +29,47 @@ available (boolean) - True for products that are available for adoption
 
 """
 import logging
+import threading
 from enum import Enum
-from decimal import Decimal
-from flask import Flask
+from decimal import Decimal, InvalidOperation
+from flask import Flask, current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import DDL, column, event, func, insert, literal_column, or_, table
+from sqlalchemy import delete, text, update
+from sqlalchemy.orm import make_transient_to_detached
+from service.common.cache import LRUCache
+from service.common.generation import DIALECTS as GENERATION_DIALECTS
+from service.common.generation import generation_query, generation_table
+from service.common.name_index import NameIndex
+from service.common.pool import MeteredQueuePool
+from service.common.session import RoutingSession
+from service.common.snapshot import ColumnarSnapshot
 
 logger = logging.getLogger("flask.app")
 
 # Create the SQLAlchemy object to be initialized later in init_db()
-db = SQLAlchemy()
+# Objects are not expired on commit, so serializing a Product that was
+# just written does not SELECT the row we already have straight back
+db = SQLAlchemy(session_options={"class_": RoutingSession, "expire_on_commit": False})
+
+# In-memory index of Product names used for autocomplete suggestions
+name_index = NameIndex()
+
+# Read-through cache of Product column values keyed by id for Product.find()
+product_cache = LRUCache()
+
+# In-memory columnar copy of the catalog for the analytics queries
+catalog_snapshot = ColumnarSnapshot()
+
+# Cache of the per Category statistics, cleared by every write
+stats_cache = LRUCache(maxsize=1)
+
+# Price percentiles reported by Product.category_stats()
+PERCENTILES = (0.5, 0.9)
+PRICE_STATS = ("min", "max", "avg") + tuple(f"p{int(f * 100)}" for f in PERCENTILES)
+
+# Row count of a table from the PostgreSQL planner statistics, -1 if unknown
+ESTIMATE_COUNT = text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:name)")
 
 
 def init_db(app):
@@ -45,6 +77,26 @@ def init_db(app):
     Product.init_db(app)
 
 
+def init_app(app):
+    """Initialize the SQLAlchemy app without connecting to the database"""
+    Product.init_app(app)
+
+
+# Serializes the first requests of an app racing to make its tables
+tables_lock = threading.Lock()
+
+
+def create_tables():
+    """Makes the tables the first time the current app needs the database"""
+    if current_app.extensions.get("product_tables"):
+        return
+    with tables_lock:
+        if not current_app.extensions.get("product_tables"):
+            # on the primary only as replicas copy it
+            db.create_all(bind_key=None)
+            current_app.extensions["product_tables"] = True
+
+
 class DataValidationError(Exception):
     """Used for an data validation errors when deserializing"""
 
@@ -60,7 +112,7 @@ class Category(Enum):
     TOOLS = 5
 
 
-class Product(db.Model):
+class Product(db.Model):  # pylint: disable=too-many-public-methods
     """
     Class that represents a Product
 
@@ -72,13 +124,24 @@ class Product(db.Model):
     # Table Schema
     ##################################################
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(100), nullable=False)
+    name = db.Column(db.String(100), nullable=False, index=True)
     description = db.Column(db.String(250), nullable=False)
-    price = db.Column(db.Numeric, nullable=False)
-    available = db.Column(db.Boolean(), nullable=False, default=True)
+    price = db.Column(db.Numeric, nullable=False, index=True)
+    available = db.Column(db.Boolean(), nullable=False, default=True, index=True)
     category = db.Column(
         db.Enum(Category), nullable=False, server_default=(Category.UNKNOWN.name)
     )
+    # row version, incremented on every update and used for ETags
+    version = db.Column(db.Integer, nullable=False, server_default="1")
+
+    # category is the leading column, so this also serves category-only filters
+    __table_args__ = (
+        db.Index("ix_product_category_available", "category", "available"),
+    )
+    __mapper_args__ = {"version_id_col": version}
+
+    # the fields returned by serialize(), in order
+    FIELDS = ("id", "name", "description", "price", "available", "category")
 
     ##################################################
     # INSTANCE METHODS
@@ -96,6 +159,9 @@ class Product(db.Model):
         self.id = None  # pylint: disable=invalid-name
         db.session.add(self)
         db.session.commit()
+        stats_cache.clear()
+        name_index.add(self.id, self.name)
+        catalog_snapshot.add(*self.snapshot_values())
 
     def update(self):
         """
@@ -105,12 +171,36 @@ class Product(db.Model):
         if not self.id:
             raise DataValidationError("Update called with empty ID field")
         db.session.commit()
+        stats_cache.clear()
+        product_cache.invalidate(self.id)
+        name_index.add(self.id, self.name)
+        catalog_snapshot.add(*self.snapshot_values())
 
     def delete(self):
         """Removes a Product from the data store"""
         logger.info("Deleting %s", self.name)
         db.session.delete(self)
         db.session.commit()
+        stats_cache.clear()
+        product_cache.invalidate(self.id)
+        name_index.remove(self.id)
+        catalog_snapshot.remove(self.id)
+
+    def snapshot_values(self) -> tuple:
+        """Returns the id, price, category code and availability for the snapshot"""
+        return self.id, self.price, self.category.value, self.available
+
+    def writable_values(self) -> dict:
+        """Returns the column values of the Product that clients may write
+
+        The id and version are left out so the database generates them.
+        """
+        table_columns = self.__table__.c
+        return {
+            c.name: getattr(self, c.name)
+            for c in table_columns
+            if c is not table_columns.id and c is not table_columns.version
+        }
 
     def serialize(self) -> dict:
         """Serializes a Product into a dictionary"""
@@ -149,7 +239,7 @@ class Product(db.Model):
             raise DataValidationError(
                 "Invalid product: missing " + error.args[0]
             ) from error
-        except TypeError as error:
+        except (InvalidOperation, TypeError) as error:
             raise DataValidationError(
                 "Invalid product: body of request contained bad or no data "
                 + str(error)
@@ -161,29 +251,441 @@ class Product(db.Model):
     ##################################################
 
     @classmethod
-    def init_db(cls, app: Flask):
-        """Initializes the database session
+    def init_app(cls, app: Flask):
+        """Configures the database for the app without connecting to it
+
+        The tables are made by create_tables() before the first request.
 
         :param app: the Flask app
         :type data: Flask
 
         """
-        logger.info("Initializing database")
+        logger.info("Configuring database")
+        # meter the connection pool; in-memory SQLite swaps in its own pool
+        # copy the options so the shared config module is left untouched
+        options = dict(app.config.get("SQLALCHEMY_ENGINE_OPTIONS", {}))
+        options.setdefault("poolclass", MeteredQueuePool)
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = options
         # This is where we initialize SQLAlchemy from the Flask app
         db.init_app(app)
+        app.before_request(create_tables)
+        name_index.max_age = app.config.get("SUGGEST_REFRESH_SECONDS", 300)
+        name_index.invalidate()
+        catalog_snapshot.max_age = app.config.get("SNAPSHOT_REFRESH_SECONDS", 300)
+        catalog_snapshot.invalidate()
+        product_cache.maxsize = app.config.get("CACHE_MAXSIZE", 1024)
+        product_cache.ttl = app.config.get("CACHE_TTL", 60)
+        product_cache.clear()
+        stats_cache.ttl = app.config.get("STATS_CACHE_TTL", 60)
+        stats_cache.clear()
+
+    @classmethod
+    def init_db(cls, app: Flask):
+        """Initializes the database session and makes the tables right away
+
+        Scripts and tests use this to work with Products outside of requests.
+
+        :param app: the Flask app
+        :type data: Flask
+
+        """
+        logger.info("Initializing database")
+        if "sqlalchemy" not in app.extensions:
+            cls.init_app(app)
         app.app_context().push()
-        db.create_all()  # make our sqlalchemy tables
+        create_tables()
+
+    @classmethod
+    def create_batch(cls, products: list) -> list:
+        """Creates many Products in a single transaction
+
+        The rows are sent as a multi-row INSERT ... RETURNING so the
+        generated ids come back without any additional round trips.
+
+        :param products: the deserialized Products to create
+        :type products: list
+
+        :return: new Product instances carrying their generated ids
+        :rtype: list
+
+        """
+        logger.info("Creating a batch of %s Products", len(products))
+        if not products:
+            return []
+        product_table = cls.__table__
+        rows = [product.writable_values() for product in products]
+        result = db.session.execute(
+            insert(product_table).returning(*product_table.columns), rows
+        )
+        created = [cls(**row) for row in result.mappings()]
+        db.session.commit()
+        stats_cache.clear()
+        for product in created:
+            name_index.add(product.id, product.name)
+            catalog_snapshot.add(*product.snapshot_values())
+        return created
+
+    @classmethod
+    def deserialize_partial(cls, data: dict) -> dict:
+        """
+        Deserializes a partial Product dictionary into column values
+        Args:
+            data (dict): A dictionary containing some of the Product data
+        """
+        if not isinstance(data, dict) or not data:
+            raise DataValidationError(
+                "Invalid product: body of request must contain at least one field"
+            )
+        field_types = {"name": str, "description": str, "available": bool}
+        unknown = set(data) - set(field_types) - {"price", "category"}
+        if unknown:
+            raise DataValidationError(
+                "Invalid attribute: " + ", ".join(sorted(unknown))
+            )
+        values = dict(data)
+        for field, field_type in field_types.items():
+            if field in values and not isinstance(values[field], field_type):
+                raise DataValidationError(
+                    f"Invalid type for {field_type.__name__} [{field}]: "
+                    + str(type(values[field]))
+                )
+        try:
+            if "price" in values:
+                values["price"] = Decimal(values["price"])
+            if "category" in values:
+                values["category"] = getattr(Category, values["category"])
+        except (InvalidOperation, TypeError) as error:
+            raise DataValidationError(
+                "Invalid product: body of request contained bad data " + str(error)
+            ) from error
+        except AttributeError as error:
+            raise DataValidationError("Invalid attribute: " + error.args[0]) from error
+        return values
+
+    @classmethod
+    def update_by_id(cls, product_id: int, product, version: int = None):
+        """Overwrites a Product with a single UPDATE ... RETURNING statement
+
+        :param product_id: the id of the Product to update
+        :type product_id: int
+        :param product: a deserialized Product holding the new values
+        :type product: Product
+        :param version: only update if the row is still at this version
+        :type version: int
+
+        :return: the updated Product, or None if no row matched
+        :rtype: Product
+
+        """
+        logger.info("Updating id %s at version %s", product_id, version)
+        statement = cls.update_statement(product_id, product, version)
+        row = db.session.execute(statement).mappings().first()
+        db.session.commit()
+        stats_cache.clear()
+        product_cache.invalidate(product_id)
+        if row is None:
+            return None
+        updated = cls(**row)
+        name_index.add(updated.id, updated.name)
+        catalog_snapshot.add(*updated.snapshot_values())
+        return updated
+
+    @classmethod
+    def update_statement(cls, product_id: int, product, version: int = None):
+        """Returns the UPDATE ... RETURNING statement that overwrites a Product
+
+        :param product_id: the id of the Product to update
+        :type product_id: int
+        :param product: a deserialized Product holding the new values
+        :type product: Product
+        :param version: only update if the row is still at this version
+        :type version: int
+
+        :return: a statement returning the updated row, if any
+        :rtype: Update
+
+        """
+        product_table = cls.__table__
+        statement = update(product_table).where(product_table.c.id == product_id)
+        if version is not None:
+            statement = statement.where(product_table.c.version == version)
+        return statement.values(
+            version=product_table.c.version + 1, **product.writable_values()
+        ).returning(*product_table.columns)
+
+    @classmethod
+    def delete_by_id(cls, product_id: int) -> int:
+        """Removes a Product with a single DELETE statement without loading it
+
+        :param product_id: the id of the Product to delete
+        :type product_id: int
+
+        :return: the number of Products deleted, 0 or 1
+        :rtype: int
+
+        """
+        logger.info("Deleting id %s", product_id)
+        # an ORM enabled DELETE also evicts the Product from the session
+        result = db.session.execute(delete(cls).where(cls.id == product_id))
+        db.session.commit()
+        stats_cache.clear()
+        product_cache.invalidate(product_id)
+        name_index.remove(product_id)
+        catalog_snapshot.remove(product_id)
+        return result.rowcount
+
+    @classmethod
+    def update_many(cls, query, values: dict) -> int:
+        """Updates every Product matched by the query with a single UPDATE
+
+        :param query: the query selecting the Products to update
+        :type query: Query
+        :param values: the column values to set
+        :type values: dict
+
+        :return: the number of Products updated
+        :rtype: int
+
+        """
+        logger.info("Updating many Products with %s", values)
+        values = dict(values, version=cls.version + 1)
+        count = query.update(values, synchronize_session=False)
+        db.session.commit()
+        stats_cache.clear()
+        product_cache.clear()
+        if "name" in values:
+            name_index.invalidate()
+        if values.keys() & {"price", "category", "available"}:
+            catalog_snapshot.invalidate()
+        return count
+
+    @classmethod
+    def delete_many(cls, query) -> int:
+        """Removes every Product matched by the query with a single DELETE
+
+        :param query: the query selecting the Products to delete
+        :type query: Query
+
+        :return: the number of Products deleted
+        :rtype: int
+
+        """
+        logger.info("Deleting many Products")
+        count = query.delete(synchronize_session=False)
+        db.session.commit()
+        stats_cache.clear()
+        product_cache.clear()
+        name_index.invalidate()
+        catalog_snapshot.invalidate()
+        return count
+
+    @classmethod
+    def suggest(cls, prefix: str, limit: int = 10) -> list:
+        """Returns Product names that complete the prefix
+
+        Lookups are answered from the in-memory name index, which is loaded
+        from the database on first use and reloaded once it gets too old.
+
+        :param prefix: the start of the name typed so far
+        :type prefix: str
+        :param limit: the maximum number of names to return
+        :type limit: int
+
+        :return: a list of distinct Product names
+        :rtype: list
+
+        """
+        if name_index.is_stale:
+            logger.info("Loading Product name index")
+            name_index.refresh(lambda: db.session.query(cls.id, cls.name))
+        return name_index.suggest(prefix, limit)
+
+    @classmethod
+    def category_stats(cls) -> dict:
+        """Returns price and availability statistics for every Category
+
+        The statistics are aggregated with GROUP BY in the database and
+        cached until the next write.
+
+        :return: the statistics keyed by the name of each Category in use
+        :rtype: dict
+
+        """
+        stats = stats_cache.get("categories")
+        if stats is None:
+            logger.info("Processing category stats query ...")
+            stats = cls._category_stats()
+            stats_cache.set("categories", stats)
+        return stats
+
+    @classmethod
+    def _category_stats(cls) -> dict:
+        # pylint: disable=not-callable
+        columns = [
+            cls.category,
+            func.count(cls.id),
+            func.count(cls.id).filter(cls.available.is_(True)),
+            func.min(cls.price),
+            func.max(cls.price),
+            func.avg(cls.price),
+        ]
+        postgres = db.engine.dialect.name == "postgresql"
+        if postgres:
+            columns += [
+                func.percentile_cont(fraction).within_group(cls.price)
+                for fraction in PERCENTILES
+            ]
+        rows = db.session.query(*columns).group_by(cls.category).all()
+        if not postgres:
+            # SQLite has no percentile aggregate so only prices are fetched
+            # and the percentiles are interpolated the same way here
+            prices = {}
+            for category, price in db.session.query(cls.category, cls.price).order_by(
+                cls.category, cls.price
+            ):
+                prices.setdefault(category, []).append(price)
+            rows = [
+                tuple(row) + tuple(percentile(prices[row[0]], f) for f in PERCENTILES)
+                for row in rows
+            ]
+        stats = {}
+        for category, count, available, *prices in rows:
+            stats[category.name] = {"count": count, "available": available}
+            for name, price in zip(PRICE_STATS, prices):
+                stats[category.name][f"{name}_price"] = str(to_cents(price))
+        return stats
+
+    @classmethod
+    def analytics(cls, **filters) -> dict:
+        """Returns price statistics answered from the in-memory snapshot
+
+        The snapshot is loaded from the database on first use and after it
+        expires, and is kept up to date by the writes of this process.
+
+        :param filters: category, available, min_price and max_price to match
+        :type filters: dict
+
+        :return: the statistics, overall and by Category name
+        :rtype: dict
+
+        """
+        logger.info("Processing analytics query for %s ...", filters)
+        if catalog_snapshot.is_stale:
+            logger.info("Loading the catalog snapshot ...")
+            catalog_snapshot.refresh(
+                lambda: (
+                    (row.id, row.price, row.category.value, row.available)
+                    for row in db.session.query(
+                        cls.id, cls.price, cls.category, cls.available
+                    ).yield_per(1000)
+                )
+            )
+        if "category" in filters:
+            filters["category"] = filters["category"].value
+        result = catalog_snapshot.summary(**filters)
+        result["categories"] = {
+            Category(code).name: stats for code, stats in result["categories"].items()
+        }
+        return result
+
+    @classmethod
+    def generation(cls):
+        """Returns a counter that changes whenever any Product is written
+
+        Listings are tagged with it, so a conditional GET costs the sum of a
+        few counter rows however many Products match.
+
+        :return: the generation, or None if the database does not keep one
+        :rtype: int
+
+        """
+        logger.info("Processing generation query ...")
+        if db.engine.dialect.name not in GENERATION_DIALECTS:
+            return None
+        return db.session.execute(
+            generation_query(product_generation).execution_options(replica=True)
+        ).scalar()
+
+    @classmethod
+    def count(cls, query=None, exact: bool = True) -> int:
+        """Returns the number of Products matching the query
+
+        Counting every row of a large table is slow on PostgreSQL, so an
+        inexact count of all Products is read from the planner statistics
+        instead. Other databases, and tables that have never been analyzed,
+        always get an exact count.
+
+        :param query: the query to count, defaults to all Products
+        :type query: Query
+
+        :param exact: False to accept an estimate for the count of all Products
+        :type exact: bool
+
+        :return: the number of matching Products
+        :rtype: int
+
+        """
+        # pylint: disable=not-callable
+        logger.info("Processing count query ...")
+        if query is None:
+            if not exact and db.engine.dialect.name == "postgresql":
+                estimate = db.session.execute(
+                    ESTIMATE_COUNT, {"name": cls.__tablename__}
+                ).scalar()
+                if estimate is not None and estimate >= 0:
+                    return int(estimate)
+            query = cls.query
+        return query.order_by(None).with_entities(func.count(cls.id)).scalar()
+
+    @classmethod
+    def rows(cls, query=None, fields=None):
+        """Returns a query for the serialized columns as plain rows
+
+        No Product instances are built for the rows, which makes large
+        listings much cheaper to fetch. Each row holds the FIELDS returned
+        by serialize() but keeps price as a Decimal and category as an enum.
+
+        :param query: the query to fetch rows for, defaults to all Products
+        :type query: Query
+
+        :param fields: the columns to select, in order, defaults to FIELDS
+        :type fields: tuple
+
+        :return: a query returning one row per Product
+        :rtype: Query
+
+        """
+        if query is None:
+            query = cls.query
+        if fields is None:
+            fields = cls.FIELDS
+        return query.with_entities(*[getattr(cls, name) for name in fields])
+
+    @classmethod
+    def replica_query(cls):
+        """Returns a query for Products that the read replica may answer
+
+        :return: a query for all Products marked as safe to read from the replica
+        :rtype: Query
+
+        """
+        return cls.query.execution_options(replica=True)
 
     @classmethod
     def all(cls) -> list:
         """Returns all of the Products in the database"""
         logger.info("Processing all Products")
-        return cls.query.all()
+        return cls.replica_query().all()
 
     @classmethod
     def find(cls, product_id: int):
         """Finds a Product by it's ID
 
+        Recently found Products are served from an in-memory cache and
+        attached to the session without going to the database. A read replica
+        may lag behind, so the cache is only filled from the primary and is
+        skipped while a client has to read its own writes from the primary.
+
         :param product_id: the id of the Product to find
         :type product_id: int
 
@@ -192,7 +694,46 @@ class Product(db.Model):
 
         """
         logger.info("Processing lookup for id %s ...", product_id)
-        return cls.query.get(product_id)
+        values = None
+        if not db.session.info.get("primary"):
+            values = product_cache.get(product_id)
+        if values is not None:
+            product = cls(**values)
+            make_transient_to_detached(product)
+            return db.session.merge(product, load=False)
+        from_replica = db.session().reads_replica(cls)
+        product = db.session.get(cls, product_id, bind_arguments={"replica": True})
+        if product is not None and not from_replica:
+            product_cache.set(
+                product_id,
+                {c.name: getattr(product, c.name) for c in cls.__table__.columns},
+            )
+        return product
+
+    @classmethod
+    def find_page(cls, query=None, limit: int = 100, after_id: int = None) -> list:
+        """Returns one page of Products using keyset pagination
+
+        Rows are ordered by the primary key so every page is a range scan
+        on its index, no matter how deep into the result set we are.
+
+        :param query: the query to paginate, defaults to all Products
+        :type query: Query
+        :param limit: the maximum number of Products to return
+        :type limit: int
+        :param after_id: only return Products with an id greater than this
+        :type after_id: int
+
+        :return: a page of at most limit Products
+        :rtype: list
+
+        """
+        logger.info("Processing page query after id %s ...", after_id)
+        if query is None:
+            query = cls.query
+        if after_id is not None:
+            query = query.filter(cls.id > after_id)
+        return query.order_by(cls.id).limit(limit).all()
 
     @classmethod
     def find_by_name(cls, name: str) -> list:
@@ -206,7 +747,7 @@ class Product(db.Model):
 
         """
         logger.info("Processing name query for %s ...", name)
-        return cls.query.filter(cls.name == name)
+        return cls.replica_query().filter(cls.name == name)
 
     @classmethod
     def find_by_price(cls, price: Decimal) -> list:
@@ -223,7 +764,27 @@ class Product(db.Model):
         price_value = price
         if isinstance(price, str):
             price_value = Decimal(price.strip(' "'))
-        return cls.query.filter(cls.price == price_value)
+        return cls.replica_query().filter(cls.price == price_value)
+
+    @classmethod
+    def find_by_price_range(
+        cls, min_price: Decimal = None, max_price: Decimal = None
+    ) -> list:
+        """Returns all Products with a price within the given range
+
+        :param min_price: the lowest price to match, inclusive
+        :type min_price: Decimal
+        :param max_price: the highest price to match, inclusive
+        :type max_price: Decimal
+
+        :return: a collection of Products within that price range
+        :rtype: list
+
+        """
+        logger.info(
+            "Processing price range query for %s - %s ...", min_price, max_price
+        )
+        return cls.find_by_filters(min_price=min_price, max_price=max_price)
 
     @classmethod
     def find_by_availability(cls, available: bool = True) -> list:
@@ -237,7 +798,7 @@ class Product(db.Model):
 
         """
         logger.info("Processing available query for %s ...", available)
-        return cls.query.filter(cls.available == available)
+        return cls.replica_query().filter(cls.available == available)
 
     @classmethod
     def find_by_category(cls, category: Category = Category.UNKNOWN) -> list:
@@ -251,4 +812,178 @@ class Product(db.Model):
 
         """
         logger.info("Processing category query for %s ...", category.name)
-        return cls.query.filter(cls.category == category)
+        return cls.replica_query().filter(cls.category == category)
+
+    @classmethod
+    def search(cls, terms: str, query=None):
+        """Returns Products matching the search terms, most relevant first
+
+        :param terms: the words to look for in the name and description
+        :type terms: str
+        :param query: the query to search within, defaults to all Products
+        :type query: Query
+
+        :return: a query for the matching Products ordered by relevance
+        :rtype: Query
+
+        """
+        logger.info("Processing search query for %s ...", terms)
+        if query is None:
+            query = cls.query
+        dialect = db.engine.dialect.name
+        if dialect == "postgresql":
+            vector = literal_column(f"{cls.__tablename__}.search_vector")
+            ts_query = func.websearch_to_tsquery("english", terms)
+            return query.filter(vector.op("@@")(ts_query)).order_by(
+                func.ts_rank(vector, ts_query).desc(), cls.id
+            )
+        if dialect == "sqlite":
+            fts = table(f"{cls.__tablename__}_fts", column("rowid"), column("rank"))
+            # quote every word so FTS5 query syntax in user input is literal
+            words = " ".join(
+                '"' + word.replace('"', '""') + '"' for word in terms.split()
+            )
+            return (
+                query.join(fts, fts.c.rowid == cls.id)
+                .filter(literal_column(fts.name).op("MATCH")(words))
+                .order_by(fts.c.rank, cls.id)
+            )
+        # other databases have no full text index, so fall back to a scan
+        pattern = f"%{terms}%"
+        return query.filter(
+            or_(cls.name.ilike(pattern), cls.description.ilike(pattern))
+        ).order_by(cls.id)
+
+    @classmethod
+    def find_by_filters(  # pylint: disable=too-many-arguments
+        cls,
+        name: str = None,
+        category: Category = None,
+        available: bool = None,
+        min_price: Decimal = None,
+        max_price: Decimal = None,
+    ):
+        """Returns all Products matching every filter that is given
+
+        :param name: the name of the Products to match
+        :type name: str
+        :param category: the Category of the Products to match
+        :type category: enum
+        :param available: True for products that are available
+        :type available: bool
+        :param min_price: the lowest price to match, inclusive
+        :type min_price: Decimal
+        :param max_price: the highest price to match, inclusive
+        :type max_price: Decimal
+
+        :return: a query for the matching Products
+        :rtype: Query
+
+        """
+        logger.info(
+            "Processing filter query for name=%s category=%s available=%s "
+            "price=%s-%s ...",
+            name,
+            category,
+            available,
+            min_price,
+            max_price,
+        )
+        return cls.replica_query().filter(
+            *cls.filter_criteria(name, category, available, min_price, max_price)
+        )
+
+    @classmethod
+    def filter_criteria(  # pylint: disable=too-many-arguments
+        cls,
+        name: str = None,
+        category: Category = None,
+        available: bool = None,
+        min_price: Decimal = None,
+        max_price: Decimal = None,
+    ) -> list:
+        """Returns the WHERE criteria for every filter that is given
+
+        :return: the criteria to combine with AND, empty to match everything
+        :rtype: list
+
+        """
+        criteria = []
+        if name is not None:
+            criteria.append(cls.name == name)
+        if category is not None:
+            criteria.append(cls.category == category)
+        if available is not None:
+            criteria.append(cls.available == available)
+        if min_price is not None:
+            criteria.append(cls.price >= min_price)
+        if max_price is not None:
+            criteria.append(cls.price <= max_price)
+        return criteria
+
+
+######################################################################
+#  U T I L I T Y   F U N C T I O N S
+######################################################################
+def percentile(values: list, fraction: float) -> Decimal:
+    """Returns the percentile of sorted values, interpolated like percentile_cont"""
+    position = (len(values) - 1) * Decimal(str(fraction))
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def to_cents(price) -> Decimal:
+    """Rounds a price, which aggregates may return as a float, to cents"""
+    return Decimal(str(price)).quantize(Decimal("0.01"))
+
+
+######################################################################
+#  F U L L   T E X T   S E A R C H
+######################################################################
+# The search index is maintained by the database itself so every write
+# path, including bulk statements, keeps it in sync. PostgreSQL uses a
+# generated tsvector column with a GIN index. SQLite uses an external
+# content FTS5 table that triggers keep up to date.
+POSTGRES_SEARCH_DDL = [
+    "ALTER TABLE %(table)s ADD COLUMN search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', name || ' ' || description)) STORED",
+    "CREATE INDEX ix_%(table)s_search_vector ON %(table)s USING GIN (search_vector)",
+]
+SQLITE_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE %(table)s_fts USING fts5("
+    "name, description, content='%(table)s', content_rowid='id')",
+    "CREATE TRIGGER %(table)s_fts_insert AFTER INSERT ON %(table)s BEGIN "
+    "INSERT INTO %(table)s_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+    "CREATE TRIGGER %(table)s_fts_delete AFTER DELETE ON %(table)s BEGIN "
+    "INSERT INTO %(table)s_fts(%(table)s_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); END",
+    "CREATE TRIGGER %(table)s_fts_update AFTER UPDATE ON %(table)s BEGIN "
+    "INSERT INTO %(table)s_fts(%(table)s_fts, rowid, name, description) "
+    "VALUES ('delete', old.id, old.name, old.description); "
+    "INSERT INTO %(table)s_fts(rowid, name, description) "
+    "VALUES (new.id, new.name, new.description); END",
+]
+
+for ddl in POSTGRES_SEARCH_DDL:
+    event.listen(
+        Product.__table__,
+        "after_create",
+        DDL(ddl).execute_if(dialect="postgresql"),
+    )
+for ddl in SQLITE_SEARCH_DDL:
+    event.listen(
+        Product.__table__,
+        "after_create",
+        DDL(ddl).execute_if(dialect="sqlite"),
+    )
+event.listen(
+    Product.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS %(table)s_fts").execute_if(dialect="sqlite"),
+)
+
+
+# counter bumped by the database on every write, see Product.generation()
+product_generation = generation_table(db.metadata, Product.__table__)
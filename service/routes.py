@@ -18,29 +18,102 @@
 """
 Product Store Service with UI
 """
-from flask import jsonify, request, abort
-from flask import url_for  # noqa: F401 pylint: disable=unused-import
-from service.models import Product, Category
+import base64
+import binascii
+import hashlib
+import json
+import logging
+import math
+import time
+from decimal import Decimal, InvalidOperation
+from enum import Enum
+from flask import jsonify, request, abort, make_response, Response, stream_with_context
+from flask import Blueprint, current_app, url_for
+from sqlalchemy.orm import Query
+from service.models import Product, Category, DataValidationError, product_cache, db
+from service.common.session import REPLICA_BIND
 from service.common import status  # HTTP Status Codes
-from . import app
+from service.common.pool import pool_stats
+from service.common.timing import timed
+
+# The routes are registered on the app by create_app()
+blueprint = Blueprint("products", __name__)
+
+logger = logging.getLogger(__name__)
+
+
+######################################################################
+# R E A D   R E P L I C A   R O U T I N G
+######################################################################
+# cookie holding the time until which a client's reads stay on the primary
+PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+@blueprint.before_app_request
+def choose_database():
+    """Keeps writes, and reads right after a client's own writes, on the primary"""
+    try:
+        primary_until = float(request.cookies.get(PRIMARY_COOKIE, "0"))
+    except ValueError:
+        primary_until = 0.0
+    db.session.info["primary"] = (
+        request.method not in SAFE_METHODS or primary_until > time.time()
+    )
+
+
+@blueprint.after_app_request
+def stick_to_primary(response):
+    """Sends a client's reads to the primary for a while after it writes"""
+    if (
+        request.method not in SAFE_METHODS
+        and response.status_code < 400
+        and REPLICA_BIND in current_app.config["SQLALCHEMY_BINDS"]
+    ):
+        window = current_app.config["REPLICA_STICKY_SECONDS"]
+        response.set_cookie(
+            PRIMARY_COOKIE,
+            str(time.time() + window),
+            max_age=math.ceil(window),
+            httponly=True,
+        )
+    return response
 
 
 ######################################################################
 # H E A L T H   C H E C K
 ######################################################################
-@app.route("/health")
+@blueprint.route("/health")
 def healthcheck():
     """Let them know our heart is still beating"""
     return jsonify(status=200, message="OK"), status.HTTP_200_OK
 
 
+######################################################################
+# C A C H E   S T A T I S T I C S
+######################################################################
+@blueprint.route("/cache/stats")
+def cache_stats():
+    """Returns the size and hit, miss and eviction counters of the Product cache"""
+    return jsonify(product_cache.stats()), status.HTTP_200_OK
+
+
+######################################################################
+# C O N N E C T I O N   P O O L   S T A T I S T I C S
+######################################################################
+@blueprint.route("/pool/stats")
+def connection_pool_stats():
+    """Returns the occupancy and checkout wait times of the connection pool"""
+    return jsonify(pool_stats(db.engine.pool)), status.HTTP_200_OK
+
+
 ######################################################################
 # H O M E   P A G E
 ######################################################################
-@app.route("/")
+@blueprint.route("/")
 def index():
     """Base URL for our service"""
-    return app.send_static_file("index.html")
+    return current_app.send_static_file("index.html")
 
 
 ######################################################################
@@ -49,7 +122,7 @@ def index():
 def check_content_type(content_type):
     """Checks that the media type is correct"""
     if "Content-Type" not in request.headers:
-        app.logger.error("No Content-Type specified.")
+        logger.error("No Content-Type specified.")
         abort(
             status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
             f"Content-Type must be {content_type}",
@@ -58,116 +131,562 @@ def check_content_type(content_type):
     if request.headers["Content-Type"] == content_type:
         return
 
-    app.logger.error("Invalid Content-Type: %s", request.headers["Content-Type"])
+    logger.error("Invalid Content-Type: %s", request.headers["Content-Type"])
     abort(
         status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
         f"Content-Type must be {content_type}",
     )
 
 
+# the query string parameters understood by product_filters()
+FILTER_PARAMS = ("name", "category", "available", "min_price", "max_price")
+
+
+def product_filters(args) -> dict:
+    """Converts the filters in the query string into Product attribute values"""
+    filters = {}
+    name = args.get("name")
+    if name:
+        filters["name"] = name
+    category = args.get("category")
+    if category:
+        try:
+            filters["category"] = Category[category.upper()]
+        except KeyError:
+            abort(status.HTTP_400_BAD_REQUEST, f"Invalid category: {category}")
+    available = args.get("available")
+    if available:
+        filters["available"] = available.lower() in ["true", "yes", "1"]
+    for bound in ("min_price", "max_price"):
+        price = args.get(bound)
+        if price:
+            filters[bound] = parse_price(bound, price)
+    return filters
+
+
+def bulk_filters(args) -> dict:
+    """Returns the filters selecting the Products of a bulk update or delete
+
+    Parameters that are not filters, empty filters and values of available
+    other than true or false are refused instead of ignored or guessed, so
+    that a typo cannot change which Products the statement matches, and
+    matching every Product has to be asked for with ?all=true.
+    """
+    unknown = sorted(set(args) - set(FILTER_PARAMS) - {"all"})
+    if unknown:
+        logger.error("Invalid filters: %s", unknown)
+        abort(
+            status.HTTP_400_BAD_REQUEST,
+            f"Invalid filters: {', '.join(unknown)}. "
+            f"Valid filters are: {', '.join(FILTER_PARAMS)}",
+        )
+    empty = sorted(name for name in FILTER_PARAMS if args.get(name) == "")
+    if empty:
+        abort(status.HTTP_400_BAD_REQUEST, f"Empty filters: {', '.join(empty)}")
+    available = args.get("available")
+    if available is not None and available.lower() not in ["true", "false"]:
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid available: {available}")
+    filters = product_filters(args)
+    if not filters and args.get("all", "").lower() not in ["true", "yes", "1"]:
+        abort(
+            status.HTTP_400_BAD_REQUEST,
+            "At least one filter is required, or all=true to match every Product",
+        )
+    return filters
+
+
+def parse_price(name: str, price: str) -> Decimal:
+    """Converts a price from the query string into a Decimal"""
+    try:
+        value = Decimal(price)
+    except InvalidOperation:
+        value = None
+    if value is None or not value.is_finite():
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid {name}: {price}")
+    return value
+
+
+def encode_cursor(product_id: int) -> str:
+    """Encodes the id of the last Product on a page as an opaque cursor"""
+    payload = json.dumps({"id": product_id}).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Decodes a cursor back into the id of the last Product seen"""
+    if cursor is None:
+        return None
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        product_id = payload["id"]
+    except (binascii.Error, ValueError, TypeError, KeyError) as error:
+        logger.error("Invalid cursor: %s", cursor)
+        abort(status.HTTP_400_BAD_REQUEST, f"Invalid cursor: {error}")
+    if not isinstance(product_id, int):
+        abort(status.HTTP_400_BAD_REQUEST, "Invalid cursor: bad product id")
+    return product_id
+
+
+def parse_limit(limit: str, limit_max: int) -> int:
+    """Converts a limit from the query string into an int from 1 to limit_max"""
+    if not limit.isdigit() or not 1 <= int(limit) <= limit_max:
+        abort(
+            status.HTTP_400_BAD_REQUEST,
+            f"limit must be an integer between 1 and {limit_max}",
+        )
+    return int(limit)
+
+
+def page_limit() -> int:
+    """Returns the page size requested in the query string"""
+    limit = request.args.get("limit", str(current_app.config["PAGE_SIZE_DEFAULT"]))
+    return parse_limit(limit, current_app.config["PAGE_SIZE_MAX"])
+
+
+def paginate(query):
+    """Returns one page of the query and the headers that link to the next page"""
+    limit = page_limit()
+    after_id = decode_cursor(request.args.get("cursor"))
+
+    # fetch one extra row to find out if there is a next page
+    page = Product.find_page(query, limit + 1, after_id)
+    headers = {}
+    if len(page) > limit:
+        page = page[:limit]
+        cursor = encode_cursor(page[-1].id)
+        args = request.args.to_dict()
+        args.update(limit=limit, cursor=cursor)
+        next_url = url_for(".list_products", _external=True, **args)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+        headers["X-Next-Cursor"] = cursor
+    return page, headers
+
+
+def requested_fields(args) -> tuple:
+    """Returns the Product fields asked for with ?fields=, or all of them"""
+    fields = args.get("fields")
+    if fields is None:
+        return Product.FIELDS
+    names = tuple(dict.fromkeys(name.strip() for name in fields.split(",")))
+    unknown = [name for name in names if name not in Product.FIELDS]
+    if unknown or not names:
+        logger.error("Invalid fields: %s", fields)
+        abort(
+            status.HTTP_400_BAD_REQUEST,
+            f"Invalid fields: {fields}. Valid fields are: {', '.join(Product.FIELDS)}",
+        )
+    return names
+
+
+def select_page(query, searching: bool):
+    """Applies the paging parameters in the query string to the query"""
+    if searching:
+        # search results are ranked by relevance so they cannot be paged by id
+        if "cursor" in request.args:
+            abort(status.HTTP_400_BAD_REQUEST, "cursor cannot be combined with q")
+        if "limit" in request.args:
+            return query.limit(page_limit()), {}
+        return query, {}
+    if "limit" in request.args or "cursor" in request.args:
+        return paginate(query)
+    return query, {}
+
+
+def product_etag(product, fields: tuple = Product.FIELDS) -> str:
+    """Returns the entity tag of a single Product from its row version"""
+    etag = f"{product.id}-{product.version}"
+    if fields != Product.FIELDS:
+        # a partial representation needs its own entity tag
+        etag = f"{etag};{','.join(fields)}"
+    return etag
+
+
+def collection_etag(path: str, ndjson: bool, generation: int) -> str:
+    """Returns the entity tag of a listing from the generation of the Products"""
+    representation = "ndjson" if ndjson else "json"
+    tag = f"{path}|{representation}|{generation}"
+    return hashlib.sha256(tag.encode("utf-8")).hexdigest()[:32]
+
+
+def if_match_version(product_id: int, if_match):
+    """Returns the Product version required by the If-Match header, if any"""
+    if not if_match or if_match.star_tag:
+        return None
+    etags = if_match.as_set()
+    versions = [
+        int(etag_version)
+        for etag_id, _, etag_version in (
+            # tags of partial representations carry the same id and version
+            etag.split(";")[0].partition("-")
+            for etag in etags
+        )
+        if etag_id == str(product_id) and etag_version.isdigit()
+    ]
+    if not versions:
+        logger.warning("If-Match %s does not match Product %s", etags, product_id)
+        abort(
+            status.HTTP_412_PRECONDITION_FAILED,
+            f"Product with id '{product_id}' does not match the If-Match header.",
+        )
+    return versions[0]
+
+
+def abort_not_found(product_id: int):
+    """Aborts the request because there is no Product with the id"""
+    abort(status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found.")
+
+
+def abort_update(product_id: int, version):
+    """Aborts an update that matched no row, with 412 if it had to match a version"""
+    if version is not None:
+        abort(
+            status.HTTP_412_PRECONDITION_FAILED,
+            f"Product with id '{product_id}' was changed by someone else.",
+        )
+    abort_not_found(product_id)
+
+
+def not_modified(etag: str):
+    """Returns a 304 response if the client already holds this entity tag"""
+    if not request.if_none_match.contains_weak(etag):
+        return None
+    logger.info("Entity tag %s not modified", etag)
+    response = make_response("", status.HTTP_304_NOT_MODIFIED)
+    response.set_etag(etag)
+    return response
+
+
+def exact_count(args) -> bool:
+    """Checks if ?count=exact asks for an exact X-Total-Count
+
+    Without filters the count is an estimate unless ?count=exact is given,
+    with filters it is always exact.
+    """
+    count = args.get("count", "estimate")
+    if count not in ("estimate", "exact"):
+        abort(status.HTTP_400_BAD_REQUEST, "count must be either estimate or exact")
+    return count == "exact"
+
+
+def sends_total_count(args, filtered: bool) -> bool:
+    """Checks if a page of a listing carries X-Total-Count
+
+    Counting the matches of filters costs as much as reading them all, so
+    pages only carry it when asked for with ?count, and pages after the
+    first never do.
+    """
+    return "cursor" not in args and (not filtered or "count" in args)
+
+
+def total_count(query) -> int:
+    """Returns the number of Products matching the query for X-Total-Count"""
+    total = Product.count(query, exact=exact_count(request.args))
+    logger.info("Counted [%s] Products", total)
+    return total
+
+
+def count_products(query) -> Response:
+    """Returns an empty response with the number of Products matching the query"""
+    response = Response(status=status.HTTP_200_OK, mimetype="application/json")
+    response.headers["X-Total-Count"] = total_count(query)
+    return response
+
+
+def wants_ndjson(accept_mimetypes) -> bool:
+    """Checks if the Accept header of the client asks for newline delimited JSON"""
+    best = accept_mimetypes.best_match(["application/json", "application/x-ndjson"])
+    return best == "application/x-ndjson"
+
+
+def encode_json(value):
+    """Encodes the column types in Product rows that json does not handle"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, Enum):
+        return value.name
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def ndjson_line(fields: tuple, row) -> str:
+    """Returns a Product row as a line of newline delimited JSON"""
+    return json.dumps(dict(zip(fields, row)), default=encode_json) + "\n"
+
+
+def stream_ndjson(rows, fields: tuple) -> Response:
+    """Streams Product rows as newline delimited JSON as they come off the cursor"""
+    if isinstance(rows, Query):
+        rows = rows.yield_per(current_app.config["STREAM_BATCH_SIZE"])
+
+    def generate():
+        count = 0
+        for row in rows:
+            count += 1
+            yield ndjson_line(fields, row)
+        logger.info("[%s] Products streamed", count)
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+
 ######################################################################
 # C R E A T E   A   N E W   P R O D U C T
 ######################################################################
-@app.route("/products", methods=["POST"])
+@blueprint.route("/products", methods=["POST"])
 def create_products():
     """
     Creates a Product
     This endpoint will create a Product based the data in the body that is posted
     """
-    app.logger.info("Request to Create a Product...")
+    logger.info("Request to Create a Product...")
     check_content_type("application/json")
 
     data = request.get_json()
-    app.logger.info("Processing: %s", data)
+    logger.info("Processing: %s", data)
     product = Product()
     product.deserialize(data)
     product.create()
-    app.logger.info("Product with new id [%s] saved!", product.id)
+    logger.info("Product with new id [%s] saved!", product.id)
 
-    message = product.serialize()
+    with timed("serialize"):
+        message = jsonify(product.serialize())
 
     #
     # Uncomment this line of code once you implement READ A PRODUCT
     #
-    location_url = url_for("get_products", product_id=product.id, _external=True)
-    return jsonify(message), status.HTTP_201_CREATED, {"Location": location_url}
+    location_url = url_for(".get_products", product_id=product.id, _external=True)
+    return message, status.HTTP_201_CREATED, {"Location": location_url}
+
+
+######################################################################
+# C R E A T E   M A N Y   P R O D U C T S
+######################################################################
+@blueprint.route("/products/batch", methods=["POST"])
+def create_products_batch():
+    """
+    Creates many Products
+    This endpoint will create every Product in the JSON array that is posted
+    in a single transaction, or none of them if any Product is invalid
+    """
+    logger.info("Request to Create a batch of Products...")
+    check_content_type("application/json")
+
+    data = request.get_json()
+    if not isinstance(data, list):
+        abort(status.HTTP_400_BAD_REQUEST, "Request body must be a JSON array")
+    batch_size_max = current_app.config["BATCH_SIZE_MAX"]
+    if len(data) > batch_size_max:
+        abort(
+            status.HTTP_400_BAD_REQUEST,
+            f"A batch may contain at most {batch_size_max} products",
+        )
+
+    products = []
+    errors = []
+    for position, item in enumerate(data):
+        try:
+            products.append(Product().deserialize(item))
+        except DataValidationError as error:
+            errors.append({"index": position, "message": str(error)})
+    if errors:
+        logger.warning("Rejected batch with %s invalid products", len(errors))
+        return (
+            jsonify(
+                status=status.HTTP_400_BAD_REQUEST,
+                error="Bad Request",
+                message=f"{len(errors)} of {len(data)} products are invalid",
+                errors=errors,
+            ),
+            status.HTTP_400_BAD_REQUEST,
+        )
+
+    products = Product.create_batch(products)
+    logger.info("[%s] Products saved", len(products))
+    with timed("serialize"):
+        message = jsonify([product.serialize() for product in products])
+    return message, status.HTTP_201_CREATED
 
 
 ######################################################################
 # L I S T   A L L   P R O D U C T S
 ######################################################################
-@app.route("/products", methods=["GET"])
+@blueprint.route("/products", methods=["GET", "HEAD"])
 def list_products():
     """Returns a list of Products"""
-    app.logger.info("Request to list Products...")
-    products = []
-    name = request.args.get("name")
-    category = request.args.get("category")
-    available = request.args.get("available")
-    if name:
-        app.logger.info("Find by name: %s", name)
-        products = Product.find_by_name(name)
-    elif category:
-        app.logger.info("Find by category: %s", category)
-        # create enum from string
-        category_value = getattr(Category, category.upper())
-        products = Product.find_by_category(category_value)
-    elif available:
-        app.logger.info("Find by available: %s", available)
-        # create bool from string
-        available_value = available.lower() in ["true", "yes", "1"]
-        products = Product.find_by_availability(available_value)
-    else:
-        app.logger.info("Find all")
-        products = Product.all()
-    results = [product.serialize() for product in products]
-    app.logger.info("[%s] Products returned", len(results))
-    return results, status.HTTP_200_OK
+    logger.info("Request to list Products...")
+    filters = product_filters(request.args)
+    logger.info("Find by filters: %s", filters)
+    products = Product.find_by_filters(**filters)
+    terms = request.args.get("q", "").strip()
+    if terms:
+        logger.info("Search for: %s", terms)
+        products = Product.search(terms, products)
+    # the count of every Product may be estimated, so it is not given the query
+    counted = products if filters or terms else None
+    if request.method == "HEAD":
+        return count_products(counted)
+    ndjson = wants_ndjson(request.accept_mimetypes)
+    generation = Product.generation()
+    etag = None
+    if generation is not None:
+        etag = collection_etag(request.full_path, ndjson, generation)
+    response = etag and not_modified(etag)
+    if response:
+        return response
+    # fetch plain rows of just the requested columns instead of Product
+    # instances to keep large listings cheap; the id is always selected last
+    # for the paging cursor and zip() drops it again when it was not asked for
+    fields = requested_fields(request.args)
+    columns = fields if "id" in fields else fields + ("id",)
+    rows, headers = select_page(Product.rows(products, columns), bool(terms))
+    if etag:
+        headers["ETag"] = f'"{etag}"'
+    if sends_total_count(request.args, counted is not None):
+        headers["X-Total-Count"] = total_count(counted)
+    if ndjson:
+        logger.info("Streaming Products as NDJSON")
+        return stream_ndjson(rows, fields), status.HTTP_200_OK, headers
+    # fetch the rows first so that the serialize timing leaves out the query
+    rows = list(rows)
+    with timed("serialize"):
+        results = [dict(zip(fields, row)) for row in rows]
+        body = json.dumps(results, default=encode_json)
+    logger.info("[%s] Products returned", len(results))
+    return Response(body, mimetype="application/json"), status.HTTP_200_OK, headers
+
+
+######################################################################
+# S U G G E S T   P R O D U C T   N A M E S
+######################################################################
+@blueprint.route("/products/suggest", methods=["GET"])
+def suggest_products():
+    """Returns Product names that complete the prefix for autocomplete"""
+    prefix = request.args.get("prefix", "").strip()
+    logger.info("Request for suggestions for: %s", prefix)
+    if not prefix:
+        abort(status.HTTP_400_BAD_REQUEST, "prefix is required")
+    limit = parse_limit(
+        request.args.get("limit", "10"), current_app.config["SUGGEST_LIMIT_MAX"]
+    )
+    names = Product.suggest(prefix, limit)
+    return jsonify(names), status.HTTP_200_OK
+
+
+######################################################################
+# P R O D U C T   S T A T I S T I C S
+######################################################################
+@blueprint.route("/products/stats", methods=["GET"])
+def product_stats():
+    """Returns the count, availability and price statistics of every Category"""
+    logger.info("Request for Product statistics")
+    return jsonify(Product.category_stats()), status.HTTP_200_OK
+
+
+######################################################################
+# P R O D U C T   A N A L Y T I C S
+######################################################################
+@blueprint.route("/products/analytics", methods=["GET"])
+def product_analytics():
+    """Returns price statistics of the matching Products from memory"""
+    logger.info("Request for Product analytics")
+    filters = product_filters(request.args)
+    if "name" in filters:
+        abort(status.HTTP_400_BAD_REQUEST, "Analytics cannot be filtered by name")
+    return jsonify(Product.analytics(**filters)), status.HTTP_200_OK
 
 
 ######################################################################
 # R E A D   A   P R O D U C T
 ######################################################################
-@app.route("/products/<int:product_id>", methods=["GET"])
+@blueprint.route("/products/<int:product_id>", methods=["GET"])
 def get_products(product_id):
     """Reads a single Product"""
-    app.logger.info("Request to read Product with id: %s", product_id)
+    logger.info("Request to read Product with id: %s", product_id)
+    fields = requested_fields(request.args)
     product = Product.find(product_id)
     if not product:
         abort(status.HTTP_404_NOT_FOUND, f"Product with id [{product_id}] not found.")
-    return jsonify(product.serialize()), status.HTTP_200_OK
+    etag = product_etag(product, fields)
+    response = not_modified(etag)
+    if response:
+        return response
+    with timed("serialize"):
+        data = product.serialize()
+        message = jsonify({name: data[name] for name in fields})
+    return message, status.HTTP_200_OK, {"ETag": f'"{etag}"'}
 
 
 ######################################################################
 # U P D A T E   A   P R O D U C T
 ######################################################################
-@app.route("/products/<int:product_id>", methods=["PUT"])
+@blueprint.route("/products/<int:product_id>", methods=["PUT"])
 def update_products(product_id):
     """
     Update a Product
     This endpoint will update a Product based the body that is posted
     """
-    app.logger.info("Request to Update a product with id [%s]", product_id)
+    logger.info("Request to Update a product with id [%s]", product_id)
     check_content_type("application/json")
-    product = Product.find(product_id)
+    try:
+        product = Product().deserialize(request.get_json())
+    except DataValidationError:
+        # a missing Product is reported before a bad request body
+        if not Product.find(product_id):
+            abort_not_found(product_id)
+        raise
+    version = if_match_version(product_id, request.if_match)
+    product = Product.update_by_id(product_id, product, version)
     if not product:
-        abort(
-            status.HTTP_404_NOT_FOUND, f"Product with id '{product_id}' was not found."
-        )
-    product.deserialize(request.get_json())
-    product.id = product_id
-    product.update()
-    return product.serialize(), status.HTTP_200_OK
+        abort_update(product_id, version)
+    etag = product_etag(product)
+    with timed("serialize"):
+        message = jsonify(product.serialize())
+    return message, status.HTTP_200_OK, {"ETag": f'"{etag}"'}
 
 
 ######################################################################
 # D E L E T E   A   P R O D U C T
 ######################################################################
-@app.route("/products/<int:product_id>", methods=["DELETE"])
+@blueprint.route("/products/<int:product_id>", methods=["DELETE"])
 def delete_products(product_id):
     """Deletes a Product"""
-    app.logger.info("Request to delete Product with id: %s", product_id)
-    product = Product.find(product_id)
-    if product:
-        product.delete()
+    logger.info("Request to delete Product with id: %s", product_id)
+    count = Product.delete_by_id(product_id)
+    logger.info("[%s] Products deleted", count)
     return "", status.HTTP_204_NO_CONTENT
+
+
+######################################################################
+# U P D A T E   P R O D U C T S   B Y   F I L T E R
+######################################################################
+@blueprint.route("/products", methods=["PATCH"])
+def bulk_update_products():
+    """
+    Update many Products
+    This endpoint will apply the fields in the body to every Product that
+    matches the query string filters using a single UPDATE statement, or to
+    all of them with ?all=true
+    """
+    logger.info("Request to Update Products matching %s", request.args)
+    check_content_type("application/json")
+    values = Product.deserialize_partial(request.get_json())
+    products = Product.find_by_filters(**bulk_filters(request.args))
+    count = Product.update_many(products, values)
+    logger.info("[%s] Products updated", count)
+    return jsonify(updated=count), status.HTTP_200_OK
+
+
+######################################################################
+# D E L E T E   P R O D U C T S   B Y   F I L T E R
+######################################################################
+@blueprint.route("/products", methods=["DELETE"])
+def bulk_delete_products():
+    """
+    Delete many Products
+    This endpoint will delete every Product that matches the query string
+    filters using a single DELETE statement, or all of them with ?all=true
+    """
+    logger.info("Request to Delete Products matching %s", request.args)
+    products = Product.find_by_filters(**bulk_filters(request.args))
+    count = Product.delete_many(products)
+    logger.info("[%s] Products deleted", count)
+    return jsonify(deleted=count), status.HTTP_200_OK
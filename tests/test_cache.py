@@ -0,0 +1,74 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Test cases for the LRU Cache
+"""
+from unittest import TestCase
+from unittest.mock import patch
+from service.common.cache import LRUCache
+
+
+class TestLRUCache(TestCase):
+    """LRU Cache tests"""
+
+    def test_get_and_set(self):
+        """It should return cached values and count hits and misses"""
+        cache = LRUCache(maxsize=2, ttl=60)
+        self.assertIsNone(cache.get("a"))
+        cache.set("a", 1)
+        self.assertEqual(cache.get("a"), 1)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (1, 1, 1))
+
+    def test_evicts_least_recently_used(self):
+        """It should evict the least recently used entry when full"""
+        cache = LRUCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    @patch("service.common.cache.time.monotonic")
+    def test_expires_entries(self, monotonic_mock):
+        """It should not return entries older than the time to live"""
+        monotonic_mock.return_value = 100.0
+        cache = LRUCache(maxsize=2, ttl=10)
+        cache.set("a", 1)
+        monotonic_mock.return_value = 109.0
+        self.assertEqual(cache.get("a"), 1)
+        monotonic_mock.return_value = 111.0
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["size"], 0)
+
+    def test_invalidate_and_clear(self):
+        """It should remove single entries and every entry"""
+        cache = LRUCache()
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.invalidate("a")
+        self.assertIsNone(cache.get("a"))
+        cache.clear()
+        self.assertIsNone(cache.get("b"))
+
+    def test_disabled(self):
+        """It should not cache anything when maxsize is zero"""
+        cache = LRUCache(maxsize=0)
+        cache.set("a", 1)
+        self.assertIsNone(cache.get("a"))
@@ -0,0 +1,130 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Test cases for the Name Index used for autocomplete
+"""
+import threading
+from unittest import TestCase
+from service.common.name_index import NameIndex, edit_distance
+from service.common.name_index import prefix_edit_distances
+
+NAMES = ["Hat", "Hammer", "Handbag", "Pants", "Pots", "Shirt", "hatchet"]
+
+
+class TestNameIndex(TestCase):
+    """Name Index tests"""
+
+    def setUp(self):
+        self.index = NameIndex()
+        self.index.rebuild(enumerate(NAMES))
+
+    def test_stale_until_rebuilt(self):
+        """It should be stale until it has been rebuilt"""
+        index = NameIndex()
+        self.assertTrue(index.is_stale)
+        index.add(1, "Hat")  # ignored until the first rebuild
+        index.rebuild([])
+        self.assertFalse(index.is_stale)
+        self.assertEqual(index.suggest("ha"), [])
+        index.invalidate()
+        self.assertTrue(index.is_stale)
+
+    def test_changes_during_rebuild(self):
+        """It should keep the changes made while the rows are being read"""
+
+        def rows():
+            yield 1, "Hat"
+            yield 2, "Helmet"
+            # written by another request after the rows were read
+            self.index.add(3, "Hammer")
+            self.index.remove(1)
+
+        self.index.rebuild(rows())
+        self.assertEqual(self.index.suggest("h"), ["Hammer", "Helmet"])
+
+    def test_refresh_while_rebuilding(self):
+        """It should answer from the old index while another thread rebuilds it"""
+        self.index.max_age = -1
+        started, finish = threading.Event(), threading.Event()
+
+        def rows():
+            started.set()
+            finish.wait(5)
+            yield 1, "Helmet"
+
+        rebuild = threading.Thread(target=self.index.refresh, args=(rows,))
+        rebuild.start()
+        started.wait(5)
+        self.index.refresh(lambda: self.fail("the rows were read twice"))
+        self.assertEqual(
+            self.index.suggest("h"), ["Hammer", "Handbag", "Hat", "hatchet"]
+        )
+        finish.set()
+        rebuild.join()
+        self.assertEqual(self.index.suggest("h"), ["Helmet"])
+        self.index.max_age = 300
+        self.index.refresh(lambda: self.fail("the rows were read again"))
+
+    def test_stale_after_max_age(self):
+        """It should be stale once it is older than max_age"""
+        index = NameIndex(max_age=-1)
+        index.rebuild([])
+        self.assertTrue(index.is_stale)
+
+    def test_suggest_prefix(self):
+        """It should suggest names that start with the prefix"""
+        self.assertEqual(
+            self.index.suggest("ha"), ["Hammer", "Handbag", "Hat", "hatchet"]
+        )
+        self.assertEqual(self.index.suggest("HAT"), ["Hat", "hatchet"])
+        self.assertEqual(self.index.suggest("ha", limit=2), ["Hammer", "Handbag"])
+
+    def test_suggest_with_typos(self):
+        """It should suggest close names when the prefix has a typo"""
+        self.assertEqual(self.index.suggest("hta")[:2], ["Hat", "hatchet"])
+        self.assertEqual(self.index.suggest("shrit"), ["Shirt"])
+        self.assertEqual(self.index.suggest("pnats"), ["Pants"])
+        self.assertEqual(self.index.suggest("hammmer"), ["Hammer"])
+        self.assertEqual(self.index.suggest("xyz"), [])
+        self.assertEqual(self.index.suggest("hx"), [])
+
+    def test_add_and_remove(self):
+        """It should keep duplicate names until the last one is removed"""
+        self.index.add(100, "Pots")
+        self.index.remove(4)  # the original Pots
+        self.assertEqual(self.index.suggest("pot"), ["Pots"])
+        self.index.remove(100)
+        self.assertEqual(self.index.suggest("pot"), [])
+        self.index.remove(100)  # removing twice is harmless
+
+    def test_rename(self):
+        """It should move a renamed item to its new name"""
+        self.index.add(0, "Fedora")
+        self.assertEqual(self.index.suggest("fed"), ["Fedora"])
+        self.assertNotIn("Hat", self.index.suggest("ha"))
+
+    def test_edit_distance(self):
+        """It should compute the Levenshtein distance"""
+        self.assertEqual(edit_distance("hat", "hat"), 0)
+        self.assertEqual(edit_distance("hat", "hta"), 1)
+        self.assertEqual(edit_distance("hat", "ham"), 1)
+        self.assertEqual(edit_distance("kitten", "sitting"), 3)
+        self.assertEqual(edit_distance("", "abc"), 3)
+
+    def test_prefix_edit_distances(self):
+        """It should compute the distances to every start of the target"""
+        self.assertEqual(prefix_edit_distances("hta", "hatc"), [3, 2, 1, 1, 2])
+        self.assertIsNone(prefix_edit_distances("xyz", "hatchet", limit=1))
@@ -0,0 +1,71 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Test cases for the metered connection pool
+"""
+import sqlite3
+from unittest import TestCase
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import StaticPool
+from service.common.pool import MeteredQueuePool, pool_stats
+
+
+def connect():
+    """Opens a throwaway database connection"""
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class TestMeteredQueuePool(TestCase):
+    """Metered Queue Pool tests"""
+
+    def setUp(self):
+        self.pool = MeteredQueuePool(connect, pool_size=1, max_overflow=1, timeout=0.01)
+
+    def tearDown(self):
+        self.pool.dispose()
+
+    def test_checkouts(self):
+        """It should count checkouts and report the pool occupancy"""
+        first = self.pool.connect()
+        second = self.pool.connect()
+        stats = self.pool.stats()
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["checked_out"], 2)
+        self.assertEqual(stats["overflow"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+        self.assertGreaterEqual(stats["checkout_wait_max_ms"], 0)
+        first.close()
+        second.close()
+        stats = self.pool.stats()
+        self.assertEqual(stats["checked_out"], 0)
+        self.assertEqual(stats["overflow"], 0)
+
+    def test_timeouts(self):
+        """It should count checkouts that time out waiting for a connection"""
+        connections = [self.pool.connect(), self.pool.connect()]
+        self.assertRaises(PoolTimeoutError, self.pool.connect)
+        stats = self.pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["checkouts"], 3)
+        self.assertGreaterEqual(stats["checkout_wait_max_ms"], 10)
+        for connection in connections:
+            connection.close()
+
+    def test_pool_stats(self):
+        """It should only report the status of pools that are not metered"""
+        self.assertEqual(pool_stats(self.pool)["size"], 1)
+        pool = StaticPool(connect)
+        self.assertEqual(pool_stats(pool), {"status": pool.status()})
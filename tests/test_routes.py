@@ -13,6 +13,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 ######################################################################
+# pylint: disable=too-many-lines
 """
 Product API Service Test Suite
 
@@ -25,13 +26,21 @@ Test cases can be run with the following:
     nosetests --stop tests/test_service.py:TestProductService
 """
 import os
+import json
 import logging
 from decimal import Decimal
 from unittest import TestCase
-from service import app
+from unittest.mock import patch
+from sqlalchemy import inspect
+from service import create_app, config
 from service.common import status
-from service.models import db, init_db, Product
+from service.models import db, init_db, Product, Category
+from service.common.pool import MeteredQueuePool
+from service.common.session import REPLICA_BIND
+from service.models import product_cache, name_index, stats_cache, catalog_snapshot
+from service.routes import encode_json
 from tests.factories import ProductFactory
+from tests.statements import capture_statements
 
 # Disable all but critical errors during normal test run
 # uncomment for debugging failing tests
@@ -42,6 +51,11 @@ DATABASE_URI = os.getenv(
 )
 BASE_URL = "/products"
 
+# Set up the test database
+app = create_app(
+    {"TESTING": True, "DEBUG": False, "SQLALCHEMY_DATABASE_URI": DATABASE_URI}
+)
+
 
 ######################################################################
 #  T E S T   C A S E S
@@ -53,10 +67,6 @@ class TestProductRoutes(TestCase):
     @classmethod
     def setUpClass(cls):
         """Run once before all tests"""
-        app.config["TESTING"] = True
-        app.config["DEBUG"] = False
-        # Set up the test database
-        app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
         app.logger.setLevel(logging.CRITICAL)
         init_db(app)
 
@@ -68,6 +78,10 @@ class TestProductRoutes(TestCase):
     def setUp(self):
         """Runs before each test"""
         self.client = app.test_client()
+        product_cache.clear()
+        stats_cache.clear()
+        name_index.invalidate()
+        catalog_snapshot.invalidate()
         db.session.query(Product).delete()  # clean up the last tests
         db.session.commit()
 
@@ -109,6 +123,37 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertEqual(data["message"], "OK")
 
+    def test_create_app_is_lazy(self):
+        """It should not make the tables until the first request"""
+        lazy_app = create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        with lazy_app.app_context():
+            self.assertEqual(inspect(db.engine).get_table_names(), [])
+        response = lazy_app.test_client().get("/health")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(lazy_app.extensions["product_tables"])
+        with lazy_app.app_context():
+            self.assertIn("product", inspect(db.engine).get_table_names())
+
+    def test_pool_stats(self):
+        """It should report the connection pool metrics"""
+        self._create_products(1)
+        response = self.client.get("/pool/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        with app.app_context():
+            metered = isinstance(db.engine.pool, MeteredQueuePool)
+        if metered:
+            self.assertGreaterEqual(data["checkouts"], 1)
+            self.assertIn("checkout_wait_avg_ms", data)
+        else:
+            # in-memory SQLite keeps its own single connection pool
+            self.assertIn("status", data)
+
+    def test_create_app_leaves_config_alone(self):
+        """It should not add the pool class to the shared engine options"""
+        create_app({"SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        self.assertNotIn("poolclass", config.SQLALCHEMY_ENGINE_OPTIONS)
+
     # TEST CREATE
     def test_create_product(self):
         """It should Create a new Product"""
@@ -206,6 +251,9 @@ class TestProductRoutes(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         response = self.client.get(f"{BASE_URL}/{product.id}")
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # deleting it again is still a success
+        response = self.client.delete(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
 
     # TEST LIST ALL
     def test_list_all_products(self):
@@ -216,6 +264,19 @@ class TestProductRoutes(TestCase):
         data = response.get_json()
         self.assertEqual(len(data), 3)
 
+    def test_list_matches_read(self):
+        """It should List Products with the same fields as a single Read"""
+        product = self._create_products(1)[0]
+        listed = self.client.get(BASE_URL).get_json()[0]
+        read = self.client.get(f"{BASE_URL}/{product.id}").get_json()
+        self.assertEqual(listed, read)
+
+    def test_encode_json(self):
+        """It should only encode the column types used by Product rows"""
+        self.assertEqual(encode_json(Decimal("1.50")), "1.50")
+        self.assertEqual(encode_json(Category.FOOD), "FOOD")
+        self.assertRaises(TypeError, encode_json, object())
+
     # TEST QUERY
     def test_query_product_by_name(self):
         """It should Query Products by name"""
@@ -241,3 +302,704 @@ class TestProductRoutes(TestCase):
         self.assertTrue(
             all(p["available"] == target_available for p in response.get_json())
         )
+
+    def test_query_product_by_category_and_availability(self):
+        """It should Query Products by category and availability together"""
+        products = self._create_products(10)
+        category = products[0].category
+        available = products[0].available
+        count = len(
+            [p for p in products if p.category == category and p.available == available]
+        )
+        response = self.client.get(
+            f"{BASE_URL}?category={category.name}&available={str(available)}"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(len(data), count)
+        for product in data:
+            self.assertEqual(product["category"], category.name)
+            self.assertEqual(product["available"], available)
+
+    def test_query_product_by_bad_category(self):
+        """It should not Query Products by an unknown category"""
+        response = self.client.get(f"{BASE_URL}?category=MALE")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_query_product_by_price_range(self):
+        """It should Query Products within a price range"""
+        products = self._create_products(10)
+        prices = sorted(product.price for product in products)
+        low, high = prices[2], prices[7]
+        count = len([p for p in products if low <= p.price <= high])
+        response = self.client.get(f"{BASE_URL}?min_price={low}&max_price={high}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(len(data), count)
+        self.assertTrue(all(low <= Decimal(p["price"]) <= high for p in data))
+
+    def test_query_product_by_bad_price(self):
+        """It should not Query Products by a price that is not a number"""
+        for price in ["cheap", "NaN"]:
+            response = self.client.get(f"{BASE_URL}?max_price={price}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST PAGINATION
+    def test_list_products_paginated(self):
+        """It should List Products one page at a time"""
+        products = self._create_products(5)
+        expected_ids = sorted(product.id for product in products)
+        response = self.client.get(f"{BASE_URL}?limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        seen_ids = [p["id"] for p in response.get_json()]
+        self.assertEqual(len(seen_ids), 2)
+        self.assertIn('rel="next"', response.headers["Link"])
+        while "X-Next-Cursor" in response.headers:
+            cursor = response.headers["X-Next-Cursor"]
+            response = self.client.get(f"{BASE_URL}?limit=2&cursor={cursor}")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen_ids.extend(p["id"] for p in response.get_json())
+        self.assertEqual(seen_ids, expected_ids)
+        self.assertNotIn("Link", response.headers)
+
+    def test_list_products_paginated_with_filter(self):
+        """It should keep the query filters when following the next link"""
+        products = self._create_products(6)
+        name = products[0].name
+        count = len([product for product in products if product.name == name])
+        response = self.client.get(f"{BASE_URL}?name={name}&limit=1")
+        seen = response.get_json()
+        while "Link" in response.headers:
+            next_url = response.headers["Link"].split(";")[0].strip("<>")
+            self.assertIn(f"name={name}", next_url)
+            response = self.client.get(next_url)
+            seen.extend(response.get_json())
+        self.assertEqual(len(seen), count)
+        self.assertTrue(all(p["name"] == name for p in seen))
+
+    def test_list_products_bad_limit(self):
+        """It should not List Products with an invalid limit"""
+        for limit in ["0", "-1", "abc", "1000000"]:
+            response = self.client.get(f"{BASE_URL}?limit={limit}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_products_bad_cursor(self):
+        """It should not List Products with an invalid cursor"""
+        for cursor in ["not-a-cursor", "e30", "eyJpZCI6ICJ4In0"]:
+            response = self.client.get(f"{BASE_URL}?cursor={cursor}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST STREAMING
+    def test_list_products_as_ndjson(self):
+        """It should stream Products as newline delimited JSON"""
+        products = self._create_products(3)
+        response = self.client.get(BASE_URL, headers={"Accept": "application/x-ndjson"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, "application/x-ndjson")
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 3)
+        data = [json.loads(line) for line in lines]
+        self.assertEqual(sorted(p["id"] for p in data), sorted(p.id for p in products))
+
+    def test_list_products_as_ndjson_paginated(self):
+        """It should stream a single page of Products as NDJSON"""
+        self._create_products(3)
+        response = self.client.get(
+            f"{BASE_URL}?limit=2", headers={"Accept": "application/x-ndjson"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.get_data(as_text=True).splitlines()), 2)
+        self.assertIn("X-Next-Cursor", response.headers)
+
+    def test_list_products_prefers_json(self):
+        """It should return a JSON array when the client accepts anything"""
+        self._create_products(2)
+        response = self.client.get(BASE_URL, headers={"Accept": "*/*"})
+        self.assertEqual(response.mimetype, "application/json")
+        self.assertEqual(len(response.get_json()), 2)
+
+    # TEST COUNTS
+    def test_list_products_total_count(self):
+        """It should send the total count of Products with the first page only"""
+        self._create_products(5)
+        response = self.client.get(f"{BASE_URL}?limit=2")
+        self.assertEqual(len(response.get_json()), 2)
+        self.assertEqual(response.headers["X-Total-Count"], "5")
+        response = self.client.get(response.headers["Link"].split(">")[0][1:])
+        self.assertNotIn("X-Total-Count", response.headers)
+
+    def test_list_products_estimates_total_count(self):
+        """It should only count the matching Products with GET when asked to"""
+        self._create_products(3)
+        with patch.object(Product, "count", wraps=Product.count) as count:
+            self.client.get(BASE_URL)
+            count.assert_called_once_with(None, exact=False)
+            count.reset_mock()
+            response = self.client.get(f"{BASE_URL}?count=exact")
+            count.assert_called_once_with(None, exact=True)
+            self.assertEqual(response.headers["X-Total-Count"], "3")
+            count.reset_mock()
+            response = self.client.get(f"{BASE_URL}?available=true")
+            count.assert_not_called()
+            self.assertNotIn("X-Total-Count", response.headers)
+            self.client.get(f"{BASE_URL}?available=true&count=estimate")
+            self.assertIsNotNone(count.call_args.args[0])
+        response = self.client.get(f"{BASE_URL}?count=roughly")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_count_products(self):
+        """It should count Products with HEAD without sending them"""
+        products = self._create_products(5)
+        available = len([product for product in products if product.available])
+        for url, count in [
+            (BASE_URL, 5),
+            (f"{BASE_URL}?count=exact", 5),
+            (f"{BASE_URL}?available=true", available),
+        ]:
+            response = self.client.head(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.headers["X-Total-Count"], str(count))
+            self.assertEqual(response.get_data(), b"")
+        response = self.client.head(f"{BASE_URL}?count=roughly")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST STATISTICS
+    def test_product_stats(self):
+        """It should return statistics for every Category in use"""
+        products = self._create_products(6)
+        response = self.client.get(f"{BASE_URL}/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        categories = {product.category.name for product in products}
+        self.assertEqual(set(data), categories)
+        self.assertEqual(sum(stats["count"] for stats in data.values()), 6)
+        for stats in data.values():
+            self.assertEqual(
+                set(stats),
+                {"count", "available", "min_price", "max_price", "avg_price"}
+                | {"p50_price", "p90_price"},
+            )
+        # writes through the API are reflected straight away
+        self.client.delete(f"{BASE_URL}/{products[0].id}")
+        data = self.client.get(f"{BASE_URL}/stats").get_json()
+        self.assertEqual(sum(stats["count"] for stats in data.values()), 5)
+
+    # TEST ANALYTICS
+    def test_product_analytics(self):
+        """It should return price statistics of the matching Products"""
+        products = self._create_products(6)
+        response = self.client.get(f"{BASE_URL}/analytics")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(data["count"], 6)
+        prices = [product.price for product in products]
+        self.assertEqual(Decimal(data["min_price"]), min(prices))
+        self.assertEqual(Decimal(data["max_price"]), max(prices))
+        category = products[0].category
+        response = self.client.get(f"{BASE_URL}/analytics?category={category.name}")
+        data = response.get_json()
+        self.assertEqual(set(data["categories"]), {category.name})
+        self.assertEqual(
+            data["count"], len([p for p in products if p.category == category])
+        )
+        response = self.client.get(f"{BASE_URL}/analytics?name=Hat")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST READ REPLICA ROUTING
+    def test_reads_stick_to_primary_after_write(self):
+        """It should keep a client's reads on the primary right after it writes"""
+        self.client.get(BASE_URL)
+        self.assertFalse(db.session.info["primary"])
+        binds = app.config["SQLALCHEMY_BINDS"]
+        app.config["SQLALCHEMY_BINDS"] = {REPLICA_BIND: "sqlite://"}
+        try:
+            response = self.client.post(BASE_URL, json=ProductFactory().serialize())
+        finally:
+            app.config["SQLALCHEMY_BINDS"] = binds
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("read_primary_until", response.headers["Set-Cookie"])
+        self.client.get(BASE_URL)
+        self.assertTrue(db.session.info["primary"])
+        self.client.set_cookie("localhost", "read_primary_until", "garbage")
+        self.client.get(BASE_URL)
+        self.assertFalse(db.session.info["primary"])
+
+    def test_sticky_reads_skip_the_cache(self):
+        """It should not serve a client's reads from values the replica cached"""
+        replica_app = create_app(
+            {
+                "SQLALCHEMY_DATABASE_URI": DATABASE_URI,
+                "SQLALCHEMY_BINDS": {REPLICA_BIND: "sqlite://"},
+            }
+        )
+        writer = replica_app.test_client()
+        reader = replica_app.test_client()
+        response = writer.post(BASE_URL, json=ProductFactory(name="Hat").serialize())
+        product = response.get_json()
+        with replica_app.app_context():
+            # the replica catches up with the insert but not the rename
+            Product.__table__.create(db.engines[REPLICA_BIND])
+            with db.engines[REPLICA_BIND].begin() as connection:
+                connection.execute(
+                    Product.__table__.insert(),
+                    dict(
+                        Product().deserialize(product).writable_values(),
+                        id=product["id"],
+                    ),
+                )
+        product["name"] = "Renamed"
+        response = writer.put(f"{BASE_URL}/{product['id']}", json=product)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = reader.get(f"{BASE_URL}/{product['id']}")
+        self.assertEqual(response.get_json()["name"], "Hat")
+        response = writer.get(f"{BASE_URL}/{product['id']}")
+        self.assertEqual(response.get_json()["name"], "Renamed")
+        with replica_app.app_context():
+            for engine in db.engines.values():
+                engine.dispose()
+
+    # TEST SPARSE FIELDSETS
+    def test_list_products_with_fields(self):
+        """It should List only the requested fields of Products"""
+        self._create_products(3)
+        with capture_statements(db.engine) as statements:
+            response = self.client.get(f"{BASE_URL}?fields=name,price")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertEqual(len(data), 3)
+        for product in data:
+            self.assertEqual(list(product), ["name", "price"])
+        select = [sql for sql in statements if "product.name" in sql][-1]
+        self.assertNotIn("description", select)
+
+    def test_list_products_with_fields_paginated(self):
+        """It should page through Products when the id is not requested"""
+        self._create_products(3)
+        response = self.client.get(f"{BASE_URL}?fields=name&limit=2")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()[0].keys(), {"name"})
+        cursor = response.headers["X-Next-Cursor"]
+        response = self.client.get(
+            f"{BASE_URL}?fields=name&limit=2&cursor={cursor}",
+            headers={"Accept": "application/x-ndjson"},
+        )
+        lines = response.get_data(as_text=True).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0]).keys(), {"name"})
+
+    def test_read_a_product_with_fields(self):
+        """It should Read only the requested fields of a Product"""
+        product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}?fields=id,name,id")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), {"id": product.id, "name": product.name})
+        etag = response.headers["ETag"]
+        self.assertNotEqual(
+            etag, self.client.get(f"{BASE_URL}/{product.id}").headers["ETag"]
+        )
+        response = self.client.get(
+            f"{BASE_URL}/{product.id}?fields=id,name", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.put(
+            f"{BASE_URL}/{product.id}",
+            json=product.serialize(),
+            headers={"If-Match": etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_products_with_bad_fields(self):
+        """It should not return Products with unknown or empty fields"""
+        product = self._create_products(1)[0]
+        for fields in ["name,secret", "", "version"]:
+            response = self.client.get(f"{BASE_URL}?fields={fields}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.get(f"{BASE_URL}/{product.id}?fields={fields}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST BATCH CREATE
+    def test_create_products_batch(self):
+        """It should Create many Products in one request"""
+        test_products = ProductFactory.create_batch(5)
+        response = self.client.post(
+            f"{BASE_URL}/batch", json=[p.serialize() for p in test_products]
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        data = response.get_json()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(len(set(p["id"] for p in data)), 5)
+        self.assertEqual(
+            sorted(p["name"] for p in data), sorted(p.name for p in test_products)
+        )
+        response = self.client.get(f"{BASE_URL}/{data[0]['id']}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(self.client.get(BASE_URL).get_json()), 5)
+
+    def test_create_products_batch_with_errors(self):
+        """It should not Create any Products when one of them is invalid"""
+        items = [p.serialize() for p in ProductFactory.create_batch(3)]
+        del items[1]["name"]
+        items[2]["available"] = "yes"
+        response = self.client.post(f"{BASE_URL}/batch", json=items)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.get_json()["errors"]
+        self.assertEqual([error["index"] for error in errors], [1, 2])
+        self.assertEqual(self.client.get(BASE_URL).get_json(), [])
+
+    def test_create_products_batch_with_bad_price(self):
+        """It should not Create a batch containing a non-numeric price"""
+        items = [p.serialize() for p in ProductFactory.create_batch(2)]
+        items[1]["price"] = "abc"
+        response = self.client.post(f"{BASE_URL}/batch", json=items)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = response.get_json()["errors"]
+        self.assertEqual([error["index"] for error in errors], [1])
+        self.assertEqual(self.client.get(BASE_URL).get_json(), [])
+
+    def test_create_products_batch_not_a_list(self):
+        """It should not Create a batch that is not a JSON array"""
+        response = self.client.post(
+            f"{BASE_URL}/batch", json=ProductFactory().serialize()
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_create_products_batch_too_large(self):
+        """It should not Create a batch larger than the configured maximum"""
+        batch_size_max = app.config["BATCH_SIZE_MAX"]
+        app.config["BATCH_SIZE_MAX"] = 2
+        try:
+            items = [p.serialize() for p in ProductFactory.create_batch(3)]
+            response = self.client.post(f"{BASE_URL}/batch", json=items)
+        finally:
+            app.config["BATCH_SIZE_MAX"] = batch_size_max
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST BULK UPDATE
+    def test_bulk_update_products(self):
+        """It should Update every Product matching the filters"""
+        products = self._create_products(10)
+        category = products[0].category
+        matching = [p for p in products if p.category == category and p.available]
+        response = self.client.patch(
+            f"{BASE_URL}?category={category.name}&available=true",
+            json={"price": "1.25", "description": "On sale"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["updated"], len(matching))
+        for product in self.client.get(BASE_URL).get_json():
+            on_sale = product["category"] == category.name and product["available"]
+            self.assertEqual(product["description"] == "On sale", on_sale)
+            if on_sale:
+                self.assertEqual(Decimal(product["price"]), Decimal("1.25"))
+
+    def test_bulk_update_products_bad_data(self):
+        """It should not Update Products with invalid fields"""
+        self._create_products(2)
+        for body in [{}, {"color": "red"}, {"available": "yes"}, {"price": "abc"}]:
+            response = self.client.patch(f"{BASE_URL}?all=true", json=body)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_products_bad_category(self):
+        """It should not Update Products with an invalid category filter"""
+        response = self.client.patch(
+            f"{BASE_URL}?category=MALE", json={"available": False}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_products_without_filters(self):
+        """It should not Update every Product unless asked to with all=true"""
+        products = self._create_products(3)
+        for query in ["", "?q=Hat", f"?categroy={products[0].category.name}"]:
+            response = self.client.patch(
+                f"{BASE_URL}{query}", json={"description": "On sale"}
+            )
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for product in self.client.get(BASE_URL).get_json():
+            self.assertNotEqual(product["description"], "On sale")
+        response = self.client.patch(
+            f"{BASE_URL}?all=true", json={"description": "On sale"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["updated"], 3)
+
+    # TEST BULK DELETE
+    def test_bulk_delete_products(self):
+        """It should Delete every Product matching the filters"""
+        products = self._create_products(10)
+        category = products[0].category
+        count = len([p for p in products if p.category == category])
+        response = self.client.delete(f"{BASE_URL}?category={category.name}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["deleted"], count)
+        remaining = self.client.get(BASE_URL).get_json()
+        self.assertEqual(len(remaining), 10 - count)
+        self.assertTrue(all(p["category"] != category.name for p in remaining))
+
+    def test_bulk_delete_products_without_filters(self):
+        """It should not Delete every Product unless asked to with all=true"""
+        products = self._create_products(3)
+        for query in ["", "?all=false", "?q=Hat", "?categroy=FOOD", "?name="]:
+            response = self.client.delete(f"{BASE_URL}{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(len(self.client.get(BASE_URL).get_json()), len(products))
+
+    def test_bulk_products_with_bad_filter_values(self):
+        """It should not Update or Delete Products when a filter is empty or invalid"""
+        products = self._create_products(3)
+        category = products[0].category.name
+        for query in [
+            "?available=ture",
+            "?available=yes",
+            f"?category={category}&max_price=",
+            f"?category={category}&available=",
+        ]:
+            response = self.client.patch(f"{BASE_URL}{query}", json={"price": "1"})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.delete(f"{BASE_URL}{query}")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        found = self.client.get(BASE_URL).get_json()
+        prices = [Decimal(product["price"]) for product in found]
+        self.assertEqual(prices, [product.price for product in products])
+        response = self.client.delete(f"{BASE_URL}?available=FALSE")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_delete_all_products(self):
+        """It should Delete all Products when asked to with all=true"""
+        self._create_products(3)
+        response = self.client.delete(f"{BASE_URL}?all=true")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json()["deleted"], 3)
+        self.assertEqual(self.client.get(BASE_URL).get_json(), [])
+
+    # TEST SEARCH
+    def test_search_products(self):
+        """It should Search Products by words in the name and description"""
+        self._create_products(3)
+        hat = ProductFactory(name="Fedora", description="A zorblax felt hat")
+        shoe = ProductFactory(name="Zorblax Shoes", description="Shoes for dancing")
+        for product in [hat, shoe]:
+            response = self.client.post(BASE_URL, json=product.serialize())
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(f"{BASE_URL}?q=zorblax")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        names = [p["name"] for p in response.get_json()]
+        self.assertEqual(sorted(names), ["Fedora", "Zorblax Shoes"])
+        response = self.client.get(f"{BASE_URL}?q=zorblax felt")
+        self.assertEqual([p["name"] for p in response.get_json()], ["Fedora"])
+        response = self.client.get(f"{BASE_URL}?q=zorblax&name=Fedora&limit=1")
+        self.assertEqual([p["name"] for p in response.get_json()], ["Fedora"])
+
+    def test_search_products_with_query_syntax(self):
+        """It should treat search syntax in the terms as plain words"""
+        self._create_products(2)
+        response = self.client.get(f'{BASE_URL}?q="AND OR* NEAR(')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), [])
+
+    def test_search_products_with_cursor(self):
+        """It should not page through search results with a cursor"""
+        cursor = "eyJpZCI6IDF9"
+        response = self.client.get(f"{BASE_URL}?q=red&cursor={cursor}")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_search_tracks_updates_and_deletes(self):
+        """It should keep the search index in sync with writes"""
+        product = self._create_products(1)[0]
+        product.description = "Completely quuxproof"
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=product.serialize())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(f"{BASE_URL}?q=quuxproof")
+        self.assertEqual([p["id"] for p in response.get_json()], [product.id])
+        self.client.delete(f"{BASE_URL}/{product.id}")
+        response = self.client.get(f"{BASE_URL}?q=quuxproof")
+        self.assertEqual(response.get_json(), [])
+
+    # TEST SUGGEST
+    def test_suggest_product_names(self):
+        """It should Suggest Product names for a prefix"""
+        for name in ["Hat", "Hammer", "Hat", "Pants"]:
+            product = ProductFactory(name=name)
+            response = self.client.post(BASE_URL, json=product.serialize())
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=ha")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.get_json(), ["Hammer", "Hat"])
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=hmam")
+        self.assertEqual(response.get_json(), ["Hammer"])
+
+    def test_suggest_tracks_writes(self):
+        """It should keep suggestions in sync with creates, updates and deletes"""
+        product = self._create_products(1)[0]
+        self.client.get(f"{BASE_URL}/suggest?prefix=x")  # load the index
+        product.name = "Xylophone"
+        self.client.put(f"{BASE_URL}/{product.id}", json=product.serialize())
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=xy")
+        self.assertEqual(response.get_json(), ["Xylophone"])
+        self.client.delete(f"{BASE_URL}/{product.id}")
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=xy")
+        self.assertEqual(response.get_json(), [])
+        new_product = ProductFactory(name="Xenon")
+        self.client.post(BASE_URL, json=new_product.serialize())
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=xe")
+        self.assertEqual(response.get_json(), ["Xenon"])
+        self.client.delete(f"{BASE_URL}?all=true")
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=xe")
+        self.assertEqual(response.get_json(), [])
+
+    def test_suggest_bad_request(self):
+        """It should not Suggest names without a prefix or with a bad limit"""
+        response = self.client.get(f"{BASE_URL}/suggest")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f"{BASE_URL}/suggest?prefix=ha&limit=0")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST CACHE
+    def test_cache_stats(self):
+        """It should report the Product cache counters"""
+        product = self._create_products(1)[0]
+        self.client.get(f"{BASE_URL}/{product.id}")
+        self.client.get(f"{BASE_URL}/{product.id}")
+        response = self.client.get("/cache/stats")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.get_json()
+        self.assertGreaterEqual(data["hits"], 1)
+        self.assertGreaterEqual(data["misses"], 1)
+        self.assertIn("evictions", data)
+        self.assertEqual(data["size"], 1)
+
+    # TEST ETAGS
+    def test_read_a_product_not_modified(self):
+        """It should return 304 when the Product has not changed"""
+        product = self._create_products(1)[0]
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        etag = response.headers["ETag"]
+        response = self.client.get(
+            f"{BASE_URL}/{product.id}", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.data, b"")
+        product.name = "Changed"
+        self.client.put(f"{BASE_URL}/{product.id}", json=product.serialize())
+        response = self.client.get(
+            f"{BASE_URL}/{product.id}", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.headers["ETag"], etag)
+        self.assertEqual(response.get_json()["name"], "Changed")
+
+    def test_list_products_not_modified(self):
+        """It should return 304 when the listing has not changed"""
+        products = self._create_products(3)
+        response = self.client.get(BASE_URL)
+        etag = response.headers["ETag"]
+        response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # a different query string is a different listing
+        response = self.client.get(
+            f"{BASE_URL}?limit=2", headers={"If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # every kind of write changes the listing
+        writes = [
+            lambda: self.client.post(BASE_URL, json=ProductFactory().serialize()),
+            lambda: self.client.patch(
+                f"{BASE_URL}?all=true", json={"description": "new"}
+            ),
+            lambda: self.client.delete(f"{BASE_URL}/{products[0].id}"),
+        ]
+        for write in writes:
+            write()
+            response = self.client.get(BASE_URL, headers={"If-None-Match": etag})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotEqual(response.headers["ETag"], etag)
+            etag = response.headers["ETag"]
+
+    def test_list_products_not_modified_is_cheap(self):
+        """It should tag listings without aggregating the matching Products"""
+        self._create_products(3)
+        url = f"{BASE_URL}?limit=2"
+        etag = self.client.get(url).headers["ETag"]
+        with capture_statements(db.engine) as statements:
+            response = self.client.get(url, headers={"If-None-Match": etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(statements), 1, statements)
+        self.assertIn("product_generation", statements[0])
+
+    # TEST OPTIMISTIC CONCURRENCY
+    def test_update_a_product_if_match(self):
+        """It should Update a Product only if it still matches If-Match"""
+        product = self._create_products(1)[0]
+        etag = self.client.get(f"{BASE_URL}/{product.id}").headers["ETag"]
+        product.name = "First"
+        response = self.client.put(
+            f"{BASE_URL}/{product.id}",
+            json=product.serialize(),
+            headers={"If-Match": etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        new_etag = response.headers["ETag"]
+        self.assertNotEqual(new_etag, etag)
+        # a second editor still holding the old ETag loses
+        product.name = "Second"
+        response = self.client.put(
+            f"{BASE_URL}/{product.id}",
+            json=product.serialize(),
+            headers={"If-Match": etag},
+        )
+        self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.get(f"{BASE_URL}/{product.id}")
+        self.assertEqual(response.get_json()["name"], "First")
+        self.assertEqual(response.headers["ETag"], new_etag)
+
+    def test_update_a_product_if_match_mismatch(self):
+        """It should not Update a Product with an ETag of another Product"""
+        products = self._create_products(2)
+        etag = self.client.get(f"{BASE_URL}/{products[0].id}").headers["ETag"]
+        for header in [etag, '"garbage"']:
+            response = self.client.put(
+                f"{BASE_URL}/{products[1].id}",
+                json=products[1].serialize(),
+                headers={"If-Match": header},
+            )
+            self.assertEqual(response.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        response = self.client.put(
+            f"{BASE_URL}/{products[1].id}",
+            json=products[1].serialize(),
+            headers={"If-Match": "*"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_update_a_product_bad_data(self):
+        """It should not Update an existing Product with bad data"""
+        product = self._create_products(1)[0]
+        data = product.serialize()
+        del data["name"]
+        response = self.client.put(f"{BASE_URL}/{product.id}", json=data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    # TEST STATEMENT COUNTS
+    def test_writes_use_one_statement(self):
+        """It should Create, Update and Delete with one statement each"""
+        test_product = ProductFactory()
+        with capture_statements(db.engine) as statements:
+            response = self.client.post(BASE_URL, json=test_product.serialize())
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(statements), 1, statements)
+        self.assertTrue(statements[0].startswith("INSERT"))
+
+        product_id = response.get_json()["id"]
+        test_product.name = "Renamed"
+        with capture_statements(db.engine) as statements:
+            response = self.client.put(
+                f"{BASE_URL}/{product_id}", json=test_product.serialize()
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(statements), 1, statements)
+        self.assertTrue(statements[0].startswith("UPDATE"))
+
+        with capture_statements(db.engine) as statements:
+            response = self.client.delete(f"{BASE_URL}/{product_id}")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(statements), 1, statements)
+        self.assertTrue(statements[0].startswith("DELETE"))
@@ -0,0 +1,168 @@
+######################################################################
+# Copyright 2016, 2023 John J. Rofrano. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+######################################################################
+"""
+Test cases for the Columnar Snapshot used for analytics
+"""
+import threading
+from decimal import Decimal
+from unittest import TestCase
+from service.common.snapshot import ColumnarSnapshot, to_cents
+
+ROWS = [
+    (3, Decimal("10.00"), 1, True),
+    (1, Decimal("2.50"), 1, False),
+    (2, Decimal("4.00"), 2, True),
+]
+
+
+class TestColumnarSnapshot(TestCase):
+    """Columnar Snapshot tests"""
+
+    def setUp(self):
+        self.snapshot = ColumnarSnapshot()
+        self.snapshot.rebuild(ROWS)
+
+    def test_stale_until_rebuilt(self):
+        """It should be stale until it has been rebuilt"""
+        snapshot = ColumnarSnapshot()
+        self.assertTrue(snapshot.is_stale)
+        snapshot.add(1, Decimal("1.00"), 0, True)  # ignored until the first rebuild
+        snapshot.rebuild([])
+        self.assertFalse(snapshot.is_stale)
+        self.assertEqual(len(snapshot), 0)
+        self.assertEqual(
+            snapshot.summary(), {"count": 0, "available": 0, "categories": {}}
+        )
+        snapshot.invalidate()
+        self.assertTrue(snapshot.is_stale)
+
+    def test_changes_during_rebuild(self):
+        """It should keep the changes made while the rows are being read"""
+        snapshot = ColumnarSnapshot()
+
+        def rows():
+            yield 1, Decimal("1.00"), 0, True
+            # written by another request after the rows were read
+            snapshot.add(2, Decimal("2.00"), 0, True)
+            snapshot.remove(1)
+
+        snapshot.rebuild(rows())
+        self.assertEqual(snapshot.summary()["total_price"], Decimal("2.00"))
+
+    def test_invalidated_during_rebuild(self):
+        """It should stay stale when invalidated while the rows are being read"""
+
+        def rows():
+            yield 1, Decimal("1.00"), 0, True
+            self.snapshot.invalidate()
+
+        self.snapshot.rebuild(rows())
+        self.assertTrue(self.snapshot.is_stale)
+
+    def test_refresh(self):
+        """It should only read the rows again once the snapshot is stale"""
+        loads = []
+
+        def load():
+            loads.append(1)
+            return [(1, Decimal("1.00"), 0, True)]
+
+        self.snapshot.refresh(load)
+        self.assertEqual(loads, [])
+        self.snapshot.invalidate()
+        self.snapshot.refresh(load)
+        self.snapshot.refresh(load)
+        self.assertEqual(loads, [1])
+        self.assertEqual(len(self.snapshot), 1)
+
+    def test_refresh_while_rebuilding(self):
+        """It should keep the old contents while another thread rebuilds"""
+        self.snapshot.max_age = -1
+        started, finish = threading.Event(), threading.Event()
+
+        def rows():
+            started.set()
+            finish.wait(5)
+            yield 1, Decimal("1.00"), 0, True
+
+        rebuild = threading.Thread(target=self.snapshot.rebuild, args=(rows(),))
+        rebuild.start()
+        started.wait(5)
+        self.snapshot.refresh(lambda: self.fail("the rows were read twice"))
+        self.assertEqual(len(self.snapshot), 3)
+        finish.set()
+        rebuild.join()
+        self.assertEqual(len(self.snapshot), 1)
+
+    def test_summary(self):
+        """It should summarize every row, overall and by category"""
+        summary = self.snapshot.summary()
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(summary["available"], 2)
+        self.assertEqual(summary["min_price"], Decimal("2.50"))
+        self.assertEqual(summary["max_price"], Decimal("10.00"))
+        self.assertEqual(summary["avg_price"], Decimal("5.50"))
+        self.assertEqual(summary["total_price"], Decimal("16.50"))
+        self.assertEqual(set(summary["categories"]), {1, 2})
+        self.assertEqual(summary["categories"][1]["count"], 2)
+        self.assertEqual(summary["categories"][2]["avg_price"], Decimal("4.00"))
+
+    def test_summary_with_filters(self):
+        """It should only summarize the rows that match the filters"""
+        self.assertEqual(self.snapshot.summary(category=1)["count"], 2)
+        self.assertEqual(self.snapshot.summary(available=False)["count"], 1)
+        summary = self.snapshot.summary(min_price=Decimal("3"), max_price="10.00")
+        self.assertEqual(summary["count"], 2)
+        self.assertEqual(summary["min_price"], Decimal("4.00"))
+        self.assertEqual(self.snapshot.summary(category=1, available=True)["count"], 1)
+
+    def test_add_and_update(self):
+        """It should append new rows and overwrite existing ones in place"""
+        for item_id in range(4, 40):
+            self.snapshot.add(item_id, Decimal("1.00"), 3, True)
+        self.snapshot.add(2, Decimal("8.00"), 2, False)
+        self.assertEqual(len(self.snapshot), 39)
+        self.assertEqual(self.snapshot.summary(category=3)["count"], 36)
+        summary = self.snapshot.summary(category=2)
+        self.assertEqual(summary["max_price"], Decimal("8.00"))
+        self.assertEqual(summary["available"], 0)
+
+    def test_add_out_of_order(self):
+        """It should insert a row with an id lower than the largest"""
+        self.snapshot.rebuild([(1, "1.00", 0, True), (5, "5.00", 0, True)])
+        self.snapshot.add(3, "3.00", 0, True)
+        self.snapshot.remove(3)
+        self.assertEqual(self.snapshot.summary()["total_price"], Decimal("6.00"))
+        self.snapshot.add(3, "3.00", 0, True)
+        self.assertEqual(self.snapshot.summary()["total_price"], Decimal("9.00"))
+
+    def test_remove(self):
+        """It should remove rows and compact once most of them are gone"""
+        self.snapshot.remove(3)
+        self.snapshot.remove(3)
+        self.snapshot.remove(99)
+        self.assertEqual(len(self.snapshot), 2)
+        self.assertEqual(self.snapshot.summary()["max_price"], Decimal("4.00"))
+        self.snapshot.remove(1)
+        self.assertEqual(len(self.snapshot), 1)
+        self.snapshot.add(1, Decimal("2.50"), 1, False)
+        self.assertEqual(self.snapshot.summary()["count"], 2)
+
+    def test_to_cents(self):
+        """It should convert prices to whole cents"""
+        self.assertEqual(to_cents(Decimal("12.34")), 1234)
+        self.assertEqual(to_cents("0.5"), 50)
+        self.assertEqual(to_cents(3), 300)